@@ -0,0 +1,81 @@
+# bench_bulk_write.py
+"""
+Compare per-chunk ChromaDB writes with BulkWriter batches.
+
+Uses a throwaway persistent client and a cheap hashing embedding function
+so the numbers reflect write/transaction overhead rather than the model.
+Pass --real-embedder to embed with all-mpnet-base-v2 instead.
+
+    python -m benchmarks.bench_bulk_write --docs 2000
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+os.environ["CHROMADB_SKIP_SQLITE_CHECK"] = "1"
+import chromadb
+from chromadb.api.types import EmbeddingFunction
+
+from src.chromadb_handler import BulkWriter, CustomEmbeddingFunction
+
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    def __init__(self, dim=768):
+        self.dim = dim
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            digest = hashlib.sha256(text.encode("utf-8")).digest()
+            vectors.append([digest[i % len(digest)] / 255.0 for i in range(self.dim)])
+        return vectors
+
+
+def make_docs(n):
+    return [f"Summary {i}: our team offers service number {i} with support and pricing details." for i in range(n)]
+
+
+def bench(name, docs, embedding_fn, write):
+    path = tempfile.mkdtemp()
+    try:
+        client = chromadb.PersistentClient(path=path)
+        collection = client.get_or_create_collection(name="bench", embedding_function=embedding_fn)
+        start = time.perf_counter()
+        write(collection, docs)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {len(docs)} docs in {elapsed:.2f}s ({len(docs) / elapsed:.0f} docs/s)")
+        return elapsed
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def per_chunk(collection, docs):
+    for i, doc in enumerate(docs):
+        collection.add(documents=[doc], metadatas=[{"chunk": i}], ids=[f"doc_{i}"])
+
+
+def bulk(collection, docs, max_count=256):
+    with BulkWriter(collection, max_count=max_count, upsert=False) as writer:
+        for i, doc in enumerate(docs):
+            writer.add(doc, {"chunk": i}, f"doc_{i}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--real-embedder", action="store_true")
+    args = parser.parse_args()
+
+    embedding_fn = CustomEmbeddingFunction() if args.real_embedder else HashEmbeddingFunction()
+    docs = make_docs(args.docs)
+    slow = bench("per-chunk", docs, embedding_fn, per_chunk)
+    fast = bench("bulk", docs, embedding_fn, lambda c, d: bulk(c, d, args.batch))
+    print(f"speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# bench_chunker.py
+"""
+Compare DocumentProcessor.chunk_text with the streaming iter_chunks on a
+multi-megabyte synthetic document, and check both produce the same chunks.
+
+    python -m benchmarks.bench_chunker --mb 8
+"""
+import argparse
+import random
+import time
+
+from src.pdf_processor import DocumentProcessor
+
+WORDS = ("our company provides marketing analytics SEO social media strategy "
+         "for clients in retail finance and healthcare e.g. Dr. Smith at U.S. offices "
+         "with 3.5 percent growth").split()
+
+
+def make_pages(total_bytes, page_bytes=3000, seed=0):
+    rng = random.Random(seed)
+    pages, size, page = [], 0, []
+    page_size = 0
+    while size < total_bytes:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30))).capitalize()
+        sentence += rng.choice([". ", "! ", "? ", ". "])
+        page.append(sentence)
+        page_size += len(sentence)
+        size += len(sentence)
+        if page_size >= page_bytes:
+            pages.append("".join(page))
+            page, page_size = [], 0
+    if page:
+        pages.append("".join(page))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=4)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    pages = make_pages(int(args.mb * 1024 * 1024))
+    text = "".join(pages)
+    print(f"{len(text) / 1e6:.1f} MB across {len(pages)} pages")
+
+    start = time.perf_counter()
+    expected = processor.chunk_text(text)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_chunk = None
+    streamed = []
+    for chunk in processor.iter_chunks(iter(pages)):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        streamed.append(chunk)
+    stream_time = time.perf_counter() - start
+
+    print(f"chunk_text : {batch_time:.2f}s, {len(expected)} chunks")
+    print(f"iter_chunks: {stream_time:.2f}s, {len(streamed)} chunks, first chunk after {first_chunk * 1000:.1f} ms")
+    print("identical output" if streamed == expected else "OUTPUT MISMATCH")
+
+
+if __name__ == "__main__":
+    main()
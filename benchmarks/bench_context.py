@@ -0,0 +1,60 @@
+# bench_context.py
+"""
+Prompt context size of the old top-3 join against ContextBuilder, on
+retrieval results built like chunk_text's output: neighbouring chunks
+that share their boundary sentences.
+
+    python -m benchmarks.bench_context --queries 200
+"""
+import argparse
+import random
+import time
+
+from src.context_builder import ContextBuilder, estimate_tokens
+
+WORDS = ("client campaign pricing support audit strategy growth analytics content brand "
+         "email search social report team plan budget launch market quarter").split()
+
+
+def make_sentences(count, rng):
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(count)]
+
+
+def make_hits(rng, candidates, chunk_sentences=8, overlap_sentences=2):
+    """Consecutive overlapping chunks of one document, with rising distances"""
+    sentences = make_sentences(candidates * chunk_sentences, rng)
+    step = chunk_sentences - overlap_sentences
+    documents = [" ".join(sentences[i * step:i * step + chunk_sentences]) for i in range(candidates)]
+    rng.shuffle(documents)
+    distances = sorted(rng.uniform(0.4, 1.6) for _ in documents)
+    return {"ids": [f"chunk-{i}" for i in range(candidates)], "documents": documents, "distances": distances}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--max-tokens", type=int, default=600)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    builder = ContextBuilder(max_tokens=args.max_tokens)
+    legacy_tokens = built_tokens = 0
+    dropped = {}
+    started = time.perf_counter()
+    for _ in range(args.queries):
+        hits = make_hits(rng, builder.candidates)
+        legacy_tokens += estimate_tokens(" ".join(hits["documents"][:3]))
+        selected, stats = builder.select(hits)
+        built_tokens += estimate_tokens("\n\n".join(text for _, text, _ in selected))
+        for reason, count in stats["dropped"].items():
+            dropped[reason] = dropped.get(reason, 0) + count
+    per_query = (time.perf_counter() - started) / args.queries * 1000
+
+    print(f"top-3 join: {legacy_tokens / args.queries:.0f} tokens/query")
+    print(f"   builder: {built_tokens / args.queries:.0f} tokens/query ({per_query:.2f} ms/query incl. setup)")
+    print(f"   dropped: {dropped} over {args.queries} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench_startup.py
+"""
+Rerun latency of building the agent's heavy dependencies.
+
+"before" builds the embedding model, Chroma client, PyAudio and the NLTK
+check from scratch on every rerun, as the module-level VoiceAIAgent()
+used to. "after" goes through src/resources.py, so only
+the first rerun pays for construction.
+
+    python -m benchmarks.bench_startup --reruns 5
+"""
+import argparse
+import time
+
+from src import resources
+
+
+def fresh_builders():
+    def embedder():
+        from src.embedder import TextEmbedder
+        return TextEmbedder()
+
+    def chroma():
+        import chromadb
+        return chromadb.PersistentClient()
+
+    def audio():
+        import pyaudio
+        return pyaudio.PyAudio()
+
+    def nltk_check():
+        import nltk
+        nltk.data.find("tokenizers/punkt")
+        nltk.data.find("tokenizers/punkt_tab")
+
+    return {"embedder": embedder, "chroma": chroma, "pyaudio": audio, "nltk": nltk_check}
+
+
+def shared_builders():
+    return {
+        "embedder": resources.get_embedder,
+        "chroma": resources.get_chroma_client,
+        "pyaudio": resources.get_pyaudio,
+        "nltk": resources.ensure_nltk_data,
+    }
+
+
+def time_reruns(builders, reruns, skip):
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        for name, build in builders.items():
+            if name in skip:
+                continue
+            try:
+                build()
+            except Exception as e:
+                print(f"  skipping {name}: {e}")
+                skip.add(name)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    skip = set()
+    before = time_reruns(fresh_builders(), args.reruns, skip)
+    after = time_reruns(shared_builders(), args.reruns, skip)
+
+    for label, timings in (("before", before), ("after", after)):
+        steady = timings[1:] or timings
+        print(f"{label:>6}: first run {timings[0]:.2f}s, "
+              f"later reruns {sum(steady) / len(steady) * 1000:.1f} ms on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench_streaming_tts.py
+"""
+Compare time-to-first-audio of the blocking reply path (generate the whole
+reply, synthesize it, play it) with sentence-level streaming
+(RAGModel.generate_response_stream + StreamingSpeaker).
+
+Gemini and the TTS service are simulated with fixed latencies so the
+numbers show the pipelining effect rather than network noise.
+
+    python -m benchmarks.bench_streaming_tts --runs 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+from types import SimpleNamespace
+
+from src.rag_model import RAGModel
+from src.streaming_tts import StreamingSpeaker
+
+REPLY = ("Thanks for asking! Our managed support plans start at a flat monthly fee. "
+         "Every plan includes round-the-clock monitoring and a dedicated account manager. "
+         "Would you like me to walk you through the options that fit your team?")
+
+
+class FakeModel:
+    """Emits the reply as a JSON object a few characters at a time"""
+
+    def __init__(self, first_token_delay, chars_per_chunk, chunk_delay):
+        self.first_token_delay = first_token_delay
+        self.chars_per_chunk = chars_per_chunk
+        self.chunk_delay = chunk_delay
+
+    def _chunks(self):
+        raw = json.dumps({"response": REPLY})
+        time.sleep(self.first_token_delay)
+        for start in range(0, len(raw), self.chars_per_chunk):
+            time.sleep(self.chunk_delay)
+            yield SimpleNamespace(text=raw[start:start + self.chars_per_chunk])
+
+    def generate_content(self, prompt, stream=False):
+        if stream:
+            return self._chunks()
+        return SimpleNamespace(text="".join(chunk.text for chunk in self._chunks()))
+
+
+class FakeDB:
+    def query(self, query_text, n_results=3):
+        return "We offer managed IT support plans."
+
+
+def make_tts(base_delay, per_char_delay):
+    def synthesize(text):
+        time.sleep(base_delay + per_char_delay * len(text))
+        return text
+    return synthesize
+
+
+def run_blocking(rag, synthesize, play):
+    started = time.perf_counter()
+    reply = rag.generate_response("How much does support cost?", [], True)
+    play(synthesize(reply))
+    return started
+
+
+def run_streaming(rag, synthesize, play):
+    speaker = StreamingSpeaker(synthesize, play)
+    for sentence in rag.generate_response_stream("How much does support cost?", [], True):
+        speaker.speak(sentence)
+    speaker.finish()
+    return speaker.started
+
+
+def bench(runner, rag, synthesize, runs):
+    latencies = []
+    for _ in range(runs):
+        played = []
+        started = runner(rag, synthesize, lambda audio: played.append(time.perf_counter()))
+        latencies.append(played[0] - started)
+    return sum(latencies) / len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--first-token", type=float, default=0.3, help="LLM time to first chunk (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="LLM delay per chunk (s)")
+    parser.add_argument("--chunk-chars", type=int, default=8)
+    parser.add_argument("--tts-base", type=float, default=0.25, help="TTS fixed latency (s)")
+    parser.add_argument("--tts-per-char", type=float, default=0.002, help="TTS latency per character (s)")
+    args = parser.parse_args()
+
+    model = FakeModel(args.first_token, args.chunk_chars, args.chunk_delay)
+    rag = RAGModel(SimpleNamespace(model=model), FakeDB())
+    synthesize = make_tts(args.tts_base, args.tts_per_char)
+
+    # generate_response/generate_response_stream print the raw reply; keep the output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        blocking = bench(run_blocking, rag, synthesize, args.runs)
+        streaming = bench(run_streaming, rag, synthesize, args.runs)
+    print(f" blocking: first audio after {blocking * 1000:.0f} ms (avg of {args.runs})")
+    print(f"streaming: first audio after {streaming * 1000:.0f} ms (avg of {args.runs})")
+    print(f"speedup: {blocking / streaming:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
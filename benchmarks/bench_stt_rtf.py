@@ -0,0 +1,93 @@
+# bench_stt_rtf.py
+"""
+Real-time factor (decode seconds / audio seconds) of the local Whisper STT
+backend per model size, on a recorded utterance.
+
+For each model it reports:
+  - full:    one decode of the whole utterance (what a final decode costs)
+  - partial: the repeated decodes CallEngine runs while the caller speaks,
+             one every --interval seconds over the growing audio. Partial
+             decoding keeps up with live speech while the slowest of these
+             finishes within the interval.
+
+    python -m benchmarks.bench_stt_rtf --wav temp_audio/recording.wav --models tiny base small
+
+Record a WAV with VOICE_DEBUG_AUDIO_DIR set, or pass any mono 16-bit file.
+"""
+import argparse
+import time
+import wave
+
+import numpy as np
+
+from src import resources
+from src.stt import SAMPLE_RATE, WhisperSTT
+
+
+def load_wav(path):
+    """Mono 16-bit WAV as int16 samples at 16 kHz"""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit samples")
+        rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if wf.getnchannels() > 1:
+            samples = samples.reshape(-1, wf.getnchannels())[:, 0]
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+    return samples
+
+
+def bench_model(size, samples, interval, runs):
+    started = time.perf_counter()
+    resources.get_whisper_model(size)
+    load = time.perf_counter() - started
+
+    stt = WhisperSTT(size)
+    stt.transcribe(samples[:SAMPLE_RATE])  # warm-up
+    duration = len(samples) / SAMPLE_RATE
+
+    full = float("inf")
+    text = ""
+    for _ in range(runs):
+        started = time.perf_counter()
+        text = stt.transcribe(samples)
+        full = min(full, time.perf_counter() - started)
+
+    step = int(interval * SAMPLE_RATE)
+    partial_times = []
+    for end in range(step, len(samples) + 1, step):
+        started = time.perf_counter()
+        stt.transcribe(samples[:end])
+        partial_times.append(time.perf_counter() - started)
+
+    return {
+        "load_seconds": round(load, 2),
+        "audio_seconds": round(duration, 2),
+        "full_rtf": round(full / duration, 3),
+        "partial_mean_seconds": round(sum(partial_times) / len(partial_times), 3) if partial_times else None,
+        "partial_max_seconds": round(max(partial_times), 3) if partial_times else None,
+        "keeps_up": bool(partial_times) and max(partial_times) <= interval,
+        "text": text
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wav", required=True)
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"])
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between partial decodes")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    samples = load_wav(args.wav)
+    for size in args.models:
+        result = bench_model(size, samples, args.interval, args.runs)
+        text = result.pop("text")
+        print(f"{size:>8}: {result}")
+        print(f"{'':>8}  {text!r}")
+
+
+if __name__ == "__main__":
+    main()
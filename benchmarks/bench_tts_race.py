@@ -0,0 +1,118 @@
+# bench_tts_race.py
+"""
+Tail latency of sentence synthesis with and without RacingTTS.
+
+The remote provider is simulated with a heavy-tailed time to first audio
+(usually fast, occasionally very slow), plus a share of requests whose
+first chunk is on time but whose rest trickles in slowly, and the local
+engine with a fixed cost, so the numbers show the ceiling the race
+deadlines put on p95/max.
+
+    python -m benchmarks.bench_tts_race --sentences 200 --deadline 0.8
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from src.tts import RacingTTS, TTSBackend
+
+
+class SimulatedRemote(TTSBackend):
+    """
+    First audio after a lognormal delay, with a `slow_rate` share of stalls
+    before it and a `trickle_rate` share of stalls after it
+    """
+
+    name = "remote"
+
+    def __init__(self, median, slow_rate, slow_seconds, trickle_rate=0.0, seed=0):
+        super().__init__()
+        self.median = median
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.trickle_rate = trickle_rate
+        self.random = random.Random(seed)
+
+    def cache_key(self, text):
+        return self.cache.make_key(text, self.name)
+
+    def _chunks(self, text):
+        delay = self.median * self.random.lognormvariate(0, 0.3)
+        if self.random.random() < self.slow_rate:
+            delay += self.slow_seconds
+        trickle = self.random.random() < self.trickle_rate
+        time.sleep(delay)
+        yield b"ID3" + text.encode()
+        if trickle:
+            time.sleep(self.slow_seconds)
+        yield b"-end"
+
+
+class SimulatedLocal(TTSBackend):
+    name = "local"
+    remote = False
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+
+    def cache_key(self, text):
+        return self.cache.make_key(text, self.name)
+
+    def _chunks(self, text):
+        time.sleep(self.seconds)
+        yield b"RIFF" + text.encode()
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    pick = lambda q: latencies[round(q * (len(latencies) - 1))]
+    return {"p50": round(pick(0.5), 3), "p95": round(pick(0.95), 3), "max": round(latencies[-1], 3)}
+
+
+def run(tts, sentences, streamed=False):
+    """Seconds until the whole clip, or with streamed=True until its first chunk reaches the player"""
+    latencies = []
+    for i in range(sentences):
+        started = time.perf_counter()
+        if streamed:
+            first = None
+            for _ in tts.stream(f"Sentence number {i}."):
+                first = first or time.perf_counter() - started
+            latencies.append(first)
+        else:
+            tts.synthesize(f"Sentence number {i}.")
+            latencies.append(time.perf_counter() - started)
+    return percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=100)
+    parser.add_argument("--median", type=float, default=0.3, help="typical remote seconds to first audio")
+    parser.add_argument("--slow-rate", type=float, default=0.08, help="share of remote requests that stall")
+    parser.add_argument("--trickle-rate", type=float, default=0.05,
+                        help="share of remote requests that stall after the first chunk")
+    parser.add_argument("--slow-seconds", type=float, default=2.0)
+    parser.add_argument("--local", type=float, default=0.15, help="local synthesis seconds")
+    parser.add_argument("--deadline", type=float, default=0.8)
+    args = parser.parse_args()
+
+    remote = lambda: SimulatedRemote(args.median, args.slow_rate, args.slow_seconds, args.trickle_rate)
+    print(f"  remote only: {run(remote(), args.sentences)}")
+    racing = RacingTTS(remote(), SimulatedLocal(args.local), deadline=args.deadline)
+    # RacingTTS prints every fallback
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run(racing, args.sentences)
+    print(f"       racing: {result}")
+    print(f"    fallbacks: {racing.fallbacks}/{args.sentences}")
+    streaming = RacingTTS(remote(), SimulatedLocal(args.local), deadline=args.deadline)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run(streaming, args.sentences, streamed=True)
+    print(f"     streamed: {result} (first audio)")
+
+
+if __name__ == "__main__":
+    main()
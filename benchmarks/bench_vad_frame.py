@@ -0,0 +1,112 @@
+# bench_vad_frame.py
+"""
+Per-frame CPU cost of VAD capture: the old list-of-bytes + deque pre-roll +
+struct.unpack RMS path against UtteranceDetector's int16 ring buffer with
+NumPy RMS and noise-floor tracking.
+
+The VAD decision is a cheap energy comparison in both cases, so the numbers
+show buffering and energy overhead rather than webrtcvad.
+
+    python -m benchmarks.bench_vad_frame --utterances 200
+"""
+import argparse
+import contextlib
+import io
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from src.voice_interface import UtteranceDetector
+
+CHUNK_SAMPLES = 480  # 30 ms at 16 kHz
+THRESHOLD = 500
+
+
+def make_stream(utterances, speech_chunks, silence_chunks, seed=0):
+    """Chunks alternating between silence and loud 'speech'"""
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for _ in range(utterances):
+        for _ in range(silence_chunks):
+            chunks.append(rng.integers(-100, 100, CHUNK_SAMPLES, dtype=np.int16).tobytes())
+        for _ in range(speech_chunks):
+            chunks.append(rng.integers(-8000, 8000, CHUNK_SAMPLES, dtype=np.int16).tobytes())
+    return chunks
+
+
+def struct_energy(data):
+    shorts = struct.unpack(f"{len(data)//2}h", data)
+    sum_squares = sum(s*s for s in shorts)
+    return int((sum_squares / len(shorts)) ** 0.5) if shorts else 0
+
+
+def legacy(chunks, silence_threshold):
+    """The previous listen_from_mic_with_vad buffering, frame for frame"""
+    utterances = 0
+    frames = []
+    pre_speech_buffer = deque(maxlen=10)
+    is_speech = False
+    silent_chunks = 0
+    for data in chunks:
+        pre_speech_buffer.append(data)
+        speech = struct_energy(data) > THRESHOLD
+        if not is_speech and speech:
+            is_speech = True
+            silent_chunks = 0
+            frames.extend(list(pre_speech_buffer))
+        elif is_speech:
+            frames.append(data)
+            if not speech:
+                silent_chunks += 1
+                if silent_chunks >= silence_threshold:
+                    b''.join(frames)
+                    utterances += 1
+                    frames = []
+                    is_speech = False
+            else:
+                silent_chunks = 0
+    return utterances
+
+
+def ring(chunks, silence_threshold):
+    detector = UtteranceDetector(lambda data: detector.level > THRESHOLD, silence_threshold,
+                                 chunk_samples=CHUNK_SAMPLES)
+    utterances = 0
+    for data in chunks:
+        if detector.feed(data) is not None:
+            utterances += 1
+    return utterances
+
+
+def bench(name, func, chunks, silence_threshold, runs):
+    best = float("inf")
+    for _ in range(runs):
+        # UtteranceDetector prints on every speech start/end
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            utterances = func(chunks, silence_threshold)
+            best = min(best, time.perf_counter() - start)
+    per_frame = best / len(chunks) * 1e6
+    print(f"{name:>8}: {per_frame:.1f} us/frame ({len(chunks)} frames, {utterances} utterances)")
+    return per_frame
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--utterances", type=int, default=100)
+    parser.add_argument("--speech-chunks", type=int, default=100, help="30 ms chunks of speech per utterance")
+    parser.add_argument("--silence-chunks", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = make_stream(args.utterances, args.speech_chunks, args.silence_chunks)
+    silence_threshold = 33  # 1 s of silence ends an utterance
+    old = bench("legacy", legacy, chunks, silence_threshold, args.runs)
+    new = bench("ring", ring, chunks, silence_threshold, args.runs)
+    print(f"speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
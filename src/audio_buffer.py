@@ -0,0 +1,72 @@
+# audio_buffer.py
+import numpy as np
+
+
+def rms(samples):
+    """RMS level of int16 samples (an array or raw bytes)"""
+    if not isinstance(samples, np.ndarray):
+        samples = np.frombuffer(samples, dtype=np.int16)
+    if not len(samples):
+        return 0.0
+    x = samples.astype(np.float32)
+    return float(np.sqrt(np.dot(x, x) / len(x)))
+
+
+class NoiseFloor:
+    """Running estimate of the background level, fed with non-speech chunks"""
+
+    def __init__(self, level=None, smoothing=0.95):
+        self.level = level
+        self.smoothing = smoothing
+
+    def update(self, level):
+        if self.level is None:
+            self.level = level
+        else:
+            self.level = self.smoothing * self.level + (1 - self.smoothing) * level
+        return self.level
+
+
+class PcmRingBuffer:
+    """
+    Fixed-capacity ring buffer of int16 samples, allocated once.
+
+    Every sample is stored twice, at i and i + capacity, so any run of the
+    most recent `capacity` samples is a single contiguous slice and can be
+    handed out as a view without copying. Positions are absolute sample
+    counts since the buffer was created.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=np.int16)
+        self.written = 0
+
+    def write(self, chunk):
+        """Append raw int16 PCM (bytes or array); returns the chunk as an int16 array"""
+        samples = np.frombuffer(chunk, dtype=np.int16) if not isinstance(chunk, np.ndarray) else chunk
+        stored = samples[-self.capacity:]
+        pos = (self.written + len(samples) - len(stored)) % self.capacity
+        first = min(len(stored), self.capacity - pos)
+        rest = len(stored) - first
+        data = self._data
+        data[pos:pos + first] = stored[:first]
+        data[pos + self.capacity:pos + self.capacity + first] = stored[:first]
+        if rest:
+            data[:rest] = stored[first:]
+            data[self.capacity:self.capacity + rest] = stored[first:]
+        self.written += len(samples)
+        return samples
+
+    @property
+    def oldest(self):
+        """Absolute position of the oldest sample still held"""
+        return max(0, self.written - self.capacity)
+
+    def view(self, start, stop=None):
+        """Samples [start, stop) as a zero-copy int16 array; valid until they are overwritten"""
+        stop = self.written if stop is None else stop
+        if start < self.oldest or stop > self.written or start > stop:
+            raise ValueError(f"Samples {start}-{stop} are not in the buffer ({self.oldest}-{self.written})")
+        offset = start % self.capacity
+        return self._data[offset:offset + (stop - start)]
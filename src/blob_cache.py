@@ -0,0 +1,124 @@
+# blob_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+def content_key(*parts):
+    """SHA-256 over the parts, NUL-separated, for content-addressed cache keys"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hit_stats(hits, misses):
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0}
+
+
+class BlobCache:
+    """
+    Persistent key -> blob store in one SQLite table, evicted
+    least-recently-used once the stored size exceeds max_bytes.
+
+    Subclasses set `table` and override encode/decode to turn their values
+    into bytes and back; blobs larger than max_bytes are never stored.
+
+    The stored size is kept as a running total, and hits only note the
+    time: last-used updates are written in batches of `touch_batch`, before
+    any eviction, and on stats()/clear(). Recency from hits since the last
+    batch is lost if the process exits, which only makes the LRU order
+    slightly stale.
+    """
+
+    table = "blobs"
+
+    def __init__(self, path, max_bytes, touch_batch=64):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.touch_batch = touch_batch
+        self._touched = {}  # key -> last-used time not yet written
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_used ON {self.table}(last_used)")
+        self._conn.commit()
+        self._total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def encode(self, value):
+        return bytes(value)
+
+    def decode(self, blob):
+        return bytes(blob)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+                self._conn.commit()
+        return self.decode(row[0])
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, key, value):
+        blob = self.encode(value)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(blob), len(blob), time.time())
+            )
+            self._touched.pop(key, None)
+            self._total += len(blob) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        # Eviction order has to see every recent hit
+        self._flush_touched()
+        rows = self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if self._total <= self.max_bytes:
+                break
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._total -= size
+
+    def stats(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        return {**hit_stats(self.hits, self.misses), "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+            self._touched.clear()
+            self._total = 0
@@ -0,0 +1,576 @@
+# call_engine.py
+"""
+Pipelined voice call loop.
+
+Each step of a turn is its own asyncio stage, connected to the next one by
+a queue:
+
+    capture -> VAD -> STT -> retrieval -> LLM -> TTS -> playback
+
+Blocking work (microphone reads, transcription, Chroma, Gemini, ElevenLabs)
+runs in worker threads, so the stages overlap: the microphone stays open for
+the whole call, retrieval starts as soon as a transcript lands, sentences are
+synthesized while Gemini is still generating and while earlier sentences
+play, and the next listen window opens during the tail of the reply.
+
+With an `interrupt` callable the call is full duplex: VAD keeps running
+while the agent talks, and once the echo gate decides the caller (not the
+agent's own voice) is speaking, playback is stopped on that same 30 ms chunk,
+the rest of the reply is dropped and the caller's speech becomes the next turn.
+
+When the STT backend supports partials (local Whisper), the utterance is
+re-decoded every `partial_interval` seconds while the caller is speaking;
+if the latest decode already covers all the speech when the utterance ends,
+it is used as the final transcript without decoding again.
+
+Partial transcripts also drive speculative retrieval: the stable prefix of
+what the caller has said (or the whole hypothesis once they pause) is sent
+to Chroma and the prompt is built while they are still talking. The work
+is reused if the final transcript asks the same question. Otherwise the
+final retrieval runs while the prompt for the final words is assembled on
+the speculative context, which is kept if the candidates are the same.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.query_cache import normalize_query
+from src.response_stream import END_CALL
+from src.tts import PrefetchedAudio, playing_seconds, start_audio
+
+GOODBYE = "Thank you for your time. Have a great day!"
+
+
+class Turn:
+    """One caller utterance and the reply to it, with per-stage timings"""
+
+    def __init__(self, index):
+        self.index = index
+        self.audio = None
+        self.user_text = ""
+        self.context = None
+        self.sentences = []
+        self.end_call = False
+        self.generation_done = False
+        self.interrupted = False
+        self.spoken = []
+        self.partial = None  # PartialTranscript while partial decoding is enabled
+        self.partial_task = None
+        self.partial_requested = 0  # ring position the latest partial decode was started at
+        self.voiced_until = 0
+        self.speculation = None  # latest Speculation started for this turn
+        self.speculation_task = None
+        self.prompt = None  # prompt prepared ahead of time, if it can be used as is
+        self.marks = {}
+        self.durations = {}
+
+    @property
+    def reply_text(self):
+        """What the caller actually heard (all of it unless they barged in)"""
+        return " ".join(self.spoken)
+
+    def mark(self, name):
+        self.marks.setdefault(name, time.perf_counter())
+
+    def record(self, stage, seconds):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def timings(self):
+        """Seconds spent per stage, plus end-of-speech to first audio and to turn end"""
+        timings = {stage: round(seconds, 3) for stage, seconds in self.durations.items()}
+        speech_end = self.marks.get("speech_end")
+        for name, mark in (("first_sentence", "first_sentence"), ("first_audio", "first_audio"),
+                           ("barge_in", "barge_in"), ("total", "done")):
+            if speech_end is not None and mark in self.marks:
+                timings[name] = round(self.marks[mark] - speech_end, 3)
+        return timings
+
+
+class Speculation:
+    """Retrieval and prompt prepared from a partial transcript"""
+
+    def __init__(self, text, history):
+        self.text = text
+        self.key = normalize_query(text)
+        self.history = history
+        self.hits = None
+        self.context = None
+        self.prompt = None
+        self.seconds = None
+        self.context_seconds = 0.0
+
+
+class CallEngine:
+    """
+    Runs one voice call until should_stop() returns True or the model ends
+    the call. on_turn(turn) is called from the engine thread after each
+    reply has been played (or interrupted).
+
+    `voice` provides open_input_stream/read_frame/utterance_detector/
+    transcribe (ImprovedVoiceInterface), `rag` provides fetch_context
+    and generate_response_stream (RAGModel). synthesize(text) returns
+    audio bytes or a stream of chunks, which play(audio) accepts as well.
+    """
+
+    def __init__(self, voice, rag, synthesize, play, interrupt=None, history=None, on_turn=None,
+                 should_stop=None, listen_tail=0.25, audio_seconds=playing_seconds, workers=4,
+                 partial_interval=0.5, on_partial=None, speculate=True, pause_seconds=0.3):
+        self.voice = voice
+        self.rag = rag
+        self.synthesize = synthesize
+        self.play = play
+        self.interrupt = interrupt
+        self.history = list(history or [])
+        self.on_turn = on_turn
+        self.should_stop = should_stop or (lambda: False)
+        self.listen_tail = listen_tail
+        self.audio_seconds = audio_seconds
+        self.workers = workers
+        self.stt = getattr(voice, "stt", None)
+        self.partials = getattr(self.stt, "supports_partials", False)
+        self.partial_samples = int(partial_interval * getattr(voice, "RATE", 16000))
+        self.on_partial = on_partial
+        self.speculate = speculate and self.partials
+        self.pause_samples = int(pause_seconds * getattr(voice, "RATE", 16000))
+        self.speculation_stats = {"turns": 0, "exact_hits": 0, "set_hits": 0, "misses": 0, "saved_seconds": 0.0}
+        self.turns = []
+        self._turn_count = 0
+
+    def run(self):
+        """Run the call to completion on the current thread"""
+        asyncio.run(self._run())
+
+    def speculation_report(self):
+        """
+        Hit rate of speculative retrieval and the latency it saved. Only exact
+        hits count toward the hit rate: a set hit (same candidates, different
+        wording) still waits for the final retrieval and only saves building
+        the context and the prompt.
+        """
+        stats = dict(self.speculation_stats)
+        turns = stats["turns"]
+        stats["hit_rate"] = round(stats["exact_hits"] / turns, 3) if turns else 0.0
+        stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+        stats["saved_per_turn"] = round(stats["saved_seconds"] / turns, 3) if turns else 0.0
+        return stats
+
+    def summary(self):
+        """Average per-stage timings over the finished turns"""
+        totals = {}
+        for turn in self.turns:
+            for stage, seconds in turn.timings().items():
+                totals.setdefault(stage, []).append(seconds)
+        return {stage: round(sum(values) / len(values), 3) for stage, values in totals.items()}
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._listening = True
+        self._current = None
+        self._speaking = None  # turn whose reply is being played, while barge-in is possible
+        # Playback gets its own thread so it never waits behind synthesis or Gemini
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="call-engine")
+        self._player = ThreadPoolExecutor(max_workers=1, thread_name_prefix="call-playback")
+
+        self._frames = asyncio.Queue()
+        self._utterances = asyncio.Queue()
+        self._transcripts = asyncio.Queue()
+        self._prompts = asyncio.Queue()
+        self._sentences = asyncio.Queue()
+        self._audio = asyncio.Queue()
+
+        capture = threading.Thread(target=self._capture, name="call-capture", daemon=True)
+        capture.start()
+        stages = [
+            asyncio.create_task(self._stage(name, step))
+            for name, step in (("vad", self._vad), ("stt", self._stt), ("retrieval", self._retrieve),
+                               ("llm", self._generate), ("tts", self._synthesize), ("playback", self._playback))
+        ]
+        try:
+            await self._stopped.wait()
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            # The capture thread notices the stop within one chunk; let it close the stream
+            await self._loop.run_in_executor(None, capture.join)
+            self._executor.shutdown(wait=False)
+            self._player.shutdown(wait=False)
+        if self.turns:
+            print(f"Call stage averages: {self.summary()}")
+        if self.speculation_stats["turns"]:
+            print(f"Speculative retrieval: {self.speculation_report()}")
+        if self.stt is not None and hasattr(self.stt, "stats"):
+            print(f"STT ({self.stt.name}): {self.stt.stats.as_dict()}")
+
+    def stop(self):
+        if not self._stopped.is_set():
+            self._stopped.set()
+
+    async def _stage(self, name, step):
+        """Run one stage forever; an error fails the current item, not the call"""
+        while True:
+            try:
+                await step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in call stage '{name}': {e}")
+                if name != "vad":
+                    # The turn in flight past the listen gate is lost; don't leave the gate shut behind it
+                    self._abandon_turn(self._current)
+
+    def _run_blocking(self, pool, func, *args):
+        return self._loop.run_in_executor(pool, func, *args)
+
+    def _capture(self):
+        """Read microphone chunks for the whole call (runs on its own thread)"""
+        stream = None
+        try:
+            stream = self.voice.open_input_stream()
+            while not self._stopped.is_set():
+                if self.should_stop():
+                    break
+                data = self.voice.read_frame(stream)
+                self._loop.call_soon_threadsafe(self._frames.put_nowait, data)
+        except Exception as e:
+            print(f"Error in voice capture: {e}")
+        finally:
+            if stream is not None:
+                try:
+                    stream.stop_stream()
+                    stream.close()
+                except Exception as e:
+                    print(f"Error closing input stream: {e}")
+            self._loop.call_soon_threadsafe(self.stop)
+
+    async def _vad(self):
+        detector = self.voice.utterance_detector()
+        echo_gate = self.voice.echo_gate() if self.interrupt is not None else None
+        gated = None  # reply the echo gate has been measuring
+        turn = None
+        while True:
+            data = await self._frames.get()
+            speaking = self._speaking
+            if echo_gate is not None and speaking is not None and not detector.in_speech:
+                # While the agent talks only the echo gate may start an utterance
+                if speaking is not gated:
+                    echo_gate.reset()
+                    gated = speaking
+                level = detector.push(data)
+                if echo_gate.feed(data, level):
+                    self._barge_in(speaking)
+                    detector.begin()
+                    turn = self._new_turn()
+                    turn.mark("speech_start")
+                    turn.partial_requested = detector.ring.written
+                continue
+
+            if not self._listening:
+                # Keep the pre-roll warm so speech right after the gate opens is not clipped
+                detector.push(data)
+                if detector.in_speech:
+                    detector.reset()
+                    turn = None
+                continue
+
+            started = time.perf_counter()
+            audio = detector.feed(data)
+            if detector.in_speech and turn is None:
+                turn = self._new_turn()
+                turn.mark("speech_start")
+                turn.partial_requested = detector.ring.written
+            if audio is not None:
+                turn = turn or self._new_turn()
+                turn.mark("speech_end")
+                turn.audio = audio
+                turn.voiced_until = detector.voiced_until
+                turn.record("listen", turn.marks["speech_end"] - turn.marks.setdefault("speech_start", turn.marks["speech_end"]))
+                # Stop listening until this turn's reply is nearly over
+                self._listening = False
+                self._current = turn
+                self._utterances.put_nowait(turn)
+                turn = None
+            elif turn is not None:
+                turn.record("vad", time.perf_counter() - started)
+                if self.partials:
+                    self._decode_partial(turn, detector)
+
+    def _decode_partial(self, turn, detector):
+        """Start decoding the utterance so far, unless a decode is running or little new audio came in"""
+        if turn.partial_task is not None and not turn.partial_task.done():
+            return
+        written = detector.ring.written
+        if written - turn.partial_requested < self.partial_samples:
+            return
+        if turn.partial.decodes and turn.partial.covers >= detector.voiced_until:
+            # Only silence since the last decode: its text is already final
+            if self.speculate and written - detector.voiced_until >= self.pause_samples:
+                self._speculate(turn, turn.partial.text, paused=True)
+            return
+        turn.partial_requested = written
+        paused = written - detector.voiced_until >= self.pause_samples
+        # Copied: the decode runs on a worker thread while capture keeps overwriting the ring
+        audio = detector.current_audio().copy()
+        turn.partial_task = asyncio.ensure_future(self._partial(turn, audio, written, paused))
+
+    async def _partial(self, turn, audio, covers, paused=False):
+        started = time.perf_counter()
+        try:
+            text = await self._run_blocking(self._executor, self.stt.transcribe, audio)
+        except Exception as e:
+            print(f"Partial transcription failed: {e}")
+            return
+        finally:
+            turn.record("stt_partial", time.perf_counter() - started)
+        turn.partial.update(text, covers)
+        print(f"Partial transcript: {text}")
+        if self.on_partial is not None:
+            self.on_partial(turn)
+        if self.speculate:
+            self._speculate(turn, turn.partial.text if paused else turn.partial.stable, paused)
+
+    def _speculate(self, turn, text, paused=False):
+        """Start retrieval and prompt assembly for what the caller has said so far"""
+        if not text.strip():
+            return
+        if turn.speculation is not None and turn.speculation.key == normalize_query(text):
+            return
+        if not paused and turn.speculation_task is not None and not turn.speculation_task.done():
+            # Still working on an earlier prefix; once the caller pauses the full text goes regardless
+            return
+        turn.speculation = Speculation(text, list(self.history))
+        turn.speculation_task = asyncio.ensure_future(self._prepare(turn.speculation))
+
+    async def _prepare(self, spec):
+        started = time.perf_counter()
+        try:
+            spec.hits = await self._run_blocking(self._executor, self.rag.retrieve, spec.text)
+            context_started = time.perf_counter()
+            spec.context = self.rag.context_from(spec.hits)
+            spec.context_seconds = time.perf_counter() - context_started
+            spec.prompt = self.rag.response_prompt(spec.text, spec.history + [spec.text], True, spec.context)
+        except Exception as e:
+            print(f"Speculative retrieval failed: {e}")
+            spec.hits = None
+        spec.seconds = time.perf_counter() - started
+
+    async def _stt(self):
+        turn = await self._utterances.get()
+        started = time.perf_counter()
+        try:
+            text = None
+            if turn.partial is not None:
+                task = turn.partial_task
+                if task is not None and not task.done() and turn.partial_requested >= turn.voiced_until:
+                    # The running decode already includes every voiced chunk
+                    await task
+                text = turn.partial.final_for(turn.voiced_until) or None
+            if text is None:
+                text = await self._run_blocking(self._executor, self.voice.transcribe, turn.audio)
+        finally:
+            turn.audio = None
+            turn.record("stt", time.perf_counter() - started)
+        if not text:
+            print("No input detected, continuing to listen...")
+            self._open_gate(turn)
+            return
+        print(f"User said: {text}")
+        turn.user_text = text
+        self._transcripts.put_nowait(turn)
+
+    async def _retrieve(self):
+        turn = await self._transcripts.get()
+        started = time.perf_counter()
+        spec = turn.speculation
+        if spec is not None and spec.key == normalize_query(turn.user_text):
+            # The caller's final words are what we speculated on: finish and use that work
+            if not turn.speculation_task.done():
+                await turn.speculation_task
+            if spec.hits is not None:
+                turn.context = spec.context
+                turn.prompt = spec.prompt
+                self._record_speculation(turn, "exact", spec.seconds - (time.perf_counter() - started))
+                turn.record("retrieval", time.perf_counter() - started)
+                self._prompts.put_nowait(turn)
+                return
+
+        try:
+            if self.speculate:
+                prepared = None
+                if spec is not None and spec.hits is not None:
+                    # Build the prompt for the final words on the speculative context while the
+                    # final retrieval runs; it is used if that retrieval finds the same candidates
+                    prepared = self._run_blocking(self._executor, self._assemble_prompt,
+                                                  turn.user_text, spec.history, spec.context)
+                hits = await self._run_blocking(self._executor, self.rag.retrieve, turn.user_text)
+                if prepared is not None and hits["ids"] == spec.hits["ids"]:
+                    turn.context = spec.context
+                    turn.prompt, seconds = await prepared
+                    self._record_speculation(turn, "set", spec.context_seconds + seconds)
+                else:
+                    turn.context = self.rag.context_from(hits)
+                    if spec is not None:
+                        self._record_speculation(turn, "miss", 0.0)
+            else:
+                turn.context = await self._run_blocking(self._executor, self.rag.fetch_context, turn.user_text)
+        except Exception as e:
+            # Let Gemini answer without context rather than dropping the turn
+            print(f"Retrieval failed: {e}")
+            turn.context = ""
+        turn.record("retrieval", time.perf_counter() - started)
+        self._prompts.put_nowait(turn)
+
+    def _assemble_prompt(self, text, history, context):
+        started = time.perf_counter()
+        prompt = self.rag.response_prompt(text, history + [text], True, context)
+        return prompt, time.perf_counter() - started
+
+    def _record_speculation(self, turn, outcome, saved):
+        stats = self.speculation_stats
+        stats["turns"] += 1
+        stats[{"exact": "exact_hits", "set": "set_hits", "miss": "misses"}[outcome]] += 1
+        stats["saved_seconds"] += max(0.0, saved)
+        turn.record("speculation_saved", max(0.0, saved))
+        print(f"Speculative retrieval {outcome} for turn {turn.index}")
+
+    async def _generate(self):
+        turn = await self._prompts.get()
+        if turn.prompt is not None and len(turn.speculation.history) != len(self.history):
+            # Another turn finished after the prompt was prepared; rebuild it
+            turn.prompt = None
+        self.history.append(turn.user_text)
+        history = list(self.history)
+        loop = self._loop
+
+        def produce():
+            # Runs on a worker thread; each sentence is handed to the TTS stage as it arrives
+            try:
+                for sentence in self.rag.generate_response_stream(turn.user_text, history, True,
+                                                                  context=turn.context, prompt=turn.prompt):
+                    if turn.interrupted:
+                        break
+                    loop.call_soon_threadsafe(self._sentences.put_nowait, (turn, sentence))
+            finally:
+                loop.call_soon_threadsafe(self._sentences.put_nowait, (turn, None))
+
+        started = time.perf_counter()
+        try:
+            await self._run_blocking(self._executor, produce)
+        finally:
+            turn.record("llm", time.perf_counter() - started)
+
+    async def _synthesize(self):
+        turn, sentence = await self._sentences.get()
+        if sentence is None:
+            if not turn.sentences:
+                print("Empty response, continuing to listen...")
+            turn.generation_done = True
+            self._audio.put_nowait((turn, None, None))
+            return
+        if turn.interrupted:
+            return
+        if sentence == END_CALL and not turn.sentences:
+            turn.end_call = True
+            sentence = GOODBYE
+        turn.mark("first_sentence")
+        turn.sentences.append(sentence)
+        print(f"AI: {sentence}")
+
+        def synthesize(text):
+            # Resolves once the first audio is in; the rest streams into the player as it arrives
+            started = time.perf_counter()
+            try:
+                return start_audio(self.synthesize(text))
+            finally:
+                turn.record("tts", time.perf_counter() - started)
+
+        # Synthesis of later sentences overlaps playback of earlier ones
+        self._audio.put_nowait((turn, sentence, self._run_blocking(self._executor, synthesize, sentence)))
+
+    async def _playback(self):
+        turn, sentence, pending = await self._audio.get()
+        if pending is None:
+            turn.mark("done")
+            self._finish_turn(turn)
+            return
+        try:
+            audio = await pending
+        except Exception as e:
+            print(f"Failed to synthesize sentence: {e}")
+            return
+        if turn.interrupted:
+            return
+
+        turn.mark("first_audio")
+        turn.spoken.append(sentence)
+        if not turn.end_call:
+            self._speaking = turn
+        if turn.generation_done and self._audio.qsize() <= 1 and not turn.end_call:
+            # Last sentence of the reply: start listening shortly before it ends. If its length
+            # is unknown the gate opens when playback finishes, never while the agent still talks
+            asyncio.ensure_future(self._gate_before_end(turn, audio, self._loop.time()))
+        started = time.perf_counter()
+        try:
+            await self._run_blocking(self._player, self.play, audio)
+        except Exception as e:
+            print(f"Failed to play sentence: {e}")
+        turn.record("playback", time.perf_counter() - started)
+
+    async def _gate_before_end(self, turn, audio, started):
+        """Open the listen gate `listen_tail` before `audio`, which started playing at `started`, ends"""
+        if isinstance(audio, PrefetchedAudio):
+            # A streamed clip's length is known once all of it has arrived
+            await self._run_blocking(self._executor, audio.done.wait)
+            audio = audio.audio
+        seconds = self.audio_seconds(audio)
+        if seconds is not None:
+            self._loop.call_at(started + max(0.0, seconds - self.listen_tail), self._open_gate, turn)
+
+    def _new_turn(self):
+        self._turn_count += 1
+        turn = Turn(self._turn_count)
+        if self.partials:
+            from src.stt import PartialTranscript
+            turn.partial = PartialTranscript()
+        return turn
+
+    def _barge_in(self, turn):
+        """The caller started talking over `turn`: cut it off and listen"""
+        turn.interrupted = True
+        turn.mark("barge_in")
+        if self.interrupt is not None:
+            self.interrupt()
+        print(f"Caller barged in, stopped turn {turn.index}")
+        self._speaking = None
+        self._current = None
+        self._listening = True
+
+    def _abandon_turn(self, turn):
+        """Drop a turn a stage failed on and start listening again"""
+        if turn is None:
+            return
+        turn.interrupted = True
+        if self._speaking is turn:
+            self._speaking = None
+        print(f"Dropped turn {turn.index}, listening again")
+        self._open_gate(turn)
+
+    def _open_gate(self, turn):
+        if self._current is turn and not self._stopped.is_set():
+            self._current = None
+            self._listening = True
+
+    def _finish_turn(self, turn):
+        if self._speaking is turn:
+            self._speaking = None
+        self.turns.append(turn)
+        if turn.sentences:
+            print(f"Turn {turn.index} timings: {turn.timings()}")
+        if turn.end_call:
+            self.stop()
+        else:
+            self._open_gate(turn)
+        if self.on_turn is not None and turn.sentences:
+            self.on_turn(turn)
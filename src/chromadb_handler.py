@@ -6,26 +6,114 @@ os.environ["CHROMADB_SKIP_SQLITE_CHECK"] = "1"
 import chromadb
 from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 from typing import List
-from src.embedder import TextEmbedder
+import time
+from src.resources import get_embedder, get_chroma_client, shared
+from src.query_cache import QueryCache, normalize_query
 
 class CustomEmbeddingFunction(EmbeddingFunction):
     def __init__(self):
-        self.embedder = TextEmbedder()
-    
+        pass
+
+    @property
+    def embedder(self):
+        # Loaded on first embed, so opening the collection doesn't pull in torch
+        return get_embedder()
+
     def __call__(self, input: Documents) -> Embeddings:
-        return [self.embedder.embed(text).tolist() for text in input]
+        # One batched encode per add/query instead of one model call per text
+        return self.embedder.embed_batch(input).tolist()
+
+class BulkWriter:
+    """
+    Buffers documents and writes them to the collection in large batches.
+    Flushes when either max_count documents or max_bytes of text are
+    buffered, and on a clean exit when used as a context manager.
+    on_written(ids) is called with the IDs of each batch once the
+    collection has accepted it.
+    """
+
+    def __init__(self, collection, max_count=256, max_bytes=1024 * 1024, upsert=True, on_flush=None,
+                 on_written=None):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.on_written = on_written
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.upsert = upsert
+        self.documents = []
+        self.metadatas = []
+        self.ids = []
+        self.embeddings = []
+        self.buffered_bytes = 0
+        self.written = 0
+
+    def add(self, document, metadata, id, embedding=None):
+        # A batch either carries precomputed embeddings for every row or for none
+        if self.ids and (embedding is None) != (not self.embeddings):
+            self.flush()
+        self.documents.append(document)
+        self.metadatas.append(metadata)
+        self.ids.append(id)
+        if embedding is not None:
+            self.embeddings.append(embedding)
+        self.buffered_bytes += len(document.encode("utf-8"))
+        if len(self.ids) >= self.max_count or self.buffered_bytes >= self.max_bytes:
+            self.flush()
+
+    def flush(self):
+        if not self.ids:
+            return
+        write = self.collection.upsert if self.upsert else self.collection.add
+        if self.embeddings:
+            write(documents=self.documents, metadatas=self.metadatas, ids=self.ids, embeddings=self.embeddings)
+        else:
+            write(documents=self.documents, metadatas=self.metadatas, ids=self.ids)
+        ids = self.ids
+        self.written += len(ids)
+        self.discard()
+        if self.on_flush:
+            self.on_flush()
+        if self.on_written:
+            self.on_written(ids)
+
+    def discard(self):
+        """Drop buffered rows without writing them"""
+        self.documents, self.metadatas, self.ids, self.embeddings = [], [], [], []
+        self.buffered_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Don't write a partial batch on the way out of a failure
+            if self.ids:
+                print(f"Discarding {len(self.ids)} buffered documents after error: {exc}")
+            self.discard()
+            return False
+        self.flush()
+        return False
+
 
 class ChromaDBHandler:
-    def __init__(self):
-        self.client = chromadb.PersistentClient()
+    def __init__(self, collection_name="company_data"):
+        self.client = get_chroma_client()
         # self.client = chromadb.PersistentClient(path="chroma_data", settings={"chroma_db_impl": "duckdb"})
         self.embedding_fn = CustomEmbeddingFunction()
-        
+        self.collection_name = collection_name
+        # Shared by every handler on this collection, so a write from any session invalidates it
+        self.query_cache = shared(f"query_cache:{collection_name}", QueryCache)
+
         self.collection = self.client.get_or_create_collection(
-            name="company_data",
+            name=collection_name,
             embedding_function=self.embedding_fn
         )
 
+    @property
+    def version(self):
+        """Counter bumped on every write to the collection"""
+        return self.query_cache.version
+
     def add_documents(self, documents, metadata, ids):
        
         self.collection.add(
@@ -33,10 +121,67 @@ class ChromaDBHandler:
             metadatas=metadata,
             ids=ids
         )
+        self.query_cache.bump_version()
 
-    def query(self, query_text, n_results=3):
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=n_results
+    def upsert_documents(self, documents, metadata, ids):
+        self.collection.upsert(
+            documents=documents,
+            metadatas=metadata,
+            ids=ids
         )
-        return " ".join(results['documents'][0])
\ No newline at end of file
+        self.query_cache.bump_version()
+
+    def bulk_writer(self, max_count=256, max_bytes=1024 * 1024, upsert=True, on_written=None):
+        """Return a BulkWriter for this collection, capped at Chroma's max batch size"""
+        try:
+            max_count = min(max_count, self.client.get_max_batch_size())
+        except Exception:
+            pass
+        return BulkWriter(self.collection, max_count=max_count, max_bytes=max_bytes, upsert=upsert,
+                          on_flush=self.query_cache.bump_version, on_written=on_written)
+
+    def delete_documents(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+            self.query_cache.bump_version()
+
+    def clear(self):
+        """Drop and recreate the collection"""
+        self.client.delete_collection(self.collection_name)
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            embedding_function=self.embedding_fn
+        )
+        self.query_cache.bump_version()
+
+    def query(self, query_text, n_results=3):
+        return " ".join(self.retrieve(query_text, n_results)["documents"])
+
+    def retrieve(self, query_text, n_results=3):
+        """Top matches for one query as {"ids", "documents", "distances"} lists"""
+        started = time.perf_counter()
+        key = normalize_query(query_text)
+        version = self.version
+        results = self.query_cache.get_results(key, n_results)
+        hit = results is not None
+        if not hit:
+            # The model sees the query as written; only the result cache folds case and spacing
+            text = query_text.strip()
+            embedding = self.query_cache.get_embedding(text)
+            if embedding is None:
+                embedding = self.embedding_fn([text])[0]
+                self.query_cache.put_embedding(text, embedding)
+            results = self.collection.query(
+                query_embeddings=[embedding],
+                n_results=n_results
+            )
+            self.query_cache.put_results(key, n_results, version, results)
+        self.query_cache.record_latency(hit, time.perf_counter() - started)
+        return {
+            "ids": results["ids"][0],
+            "documents": results["documents"][0],
+            "distances": (results.get("distances") or [[]])[0]
+        }
+
+    def cache_stats(self):
+        return self.query_cache.stats()
\ No newline at end of file
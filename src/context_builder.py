@@ -0,0 +1,116 @@
+# context_builder.py
+import re
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (~4 characters per token), good enough for budgeting"""
+    return (len(text) + 3) // 4
+
+
+def _shingles(words, size=3):
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextBuilder:
+    """
+    Turns retrieval candidates into the prompt context.
+
+    Candidates are ranked by distance and cut off past max_distance (or
+    more than `margin` behind the best hit). Sentences already taken from a
+    higher-ranked passage are dropped, which removes the overlap between
+    neighbouring chunks, and passages that are near-duplicates of one
+    already chosen (word-shingle Jaccard >= `similarity`) are skipped.
+    What is left is packed in relevance order into max_tokens.
+    """
+
+    def __init__(self, max_tokens=600, candidates=8, max_distance=1.4, margin=0.35, min_results=1,
+                 similarity=0.8, min_novel=0.3):
+        self.max_tokens = max_tokens
+        self.candidates = candidates
+        self.max_distance = max_distance
+        self.margin = margin
+        self.min_results = min_results
+        self.similarity = similarity
+        self.min_novel = min_novel
+
+    def _ranked(self, hits):
+        ranked = sorted(zip(hits["ids"], hits["documents"], hits["distances"] or [0.0] * len(hits["ids"])),
+                        key=lambda hit: hit[2])
+        if not ranked:
+            return ranked
+        limit = ranked[0][2] + self.margin if self.margin is not None else float("inf")
+        if self.max_distance is not None:
+            limit = min(limit, self.max_distance)
+        kept = [hit for hit in ranked if hit[2] <= limit]
+        # Never answer from nothing when the knowledge base has something
+        return kept if len(kept) >= self.min_results else ranked[:self.min_results]
+
+    def select(self, hits):
+        """
+        The (id, text, distance) passages that go into the context, best
+        first, and stats on what was dropped and how many tokens were used
+        """
+        budget = self.max_tokens
+        seen_sentences = set()
+        chosen_shingles = []
+        selected = []
+        dropped = {"distance": 0, "duplicate": 0, "budget": 0}
+
+        ranked = self._ranked(hits)
+        dropped["distance"] = len(hits["ids"]) - len(ranked)
+        for id, document, distance in ranked:
+            sentences = [s for s in _SENTENCE.split(document.strip()) if s]
+            novel = [s for s in sentences if " ".join(_WORD.findall(s.lower())) not in seen_sentences]
+            words = _WORD.findall(" ".join(novel).lower())
+            shingles = _shingles(words)
+            duplicate = not words or len(novel) < self.min_novel * len(sentences) or any(
+                len(shingles & other) / len(shingles | other) >= self.similarity for other in chosen_shingles)
+            if duplicate:
+                dropped["duplicate"] += 1
+                continue
+
+            # Whole sentences, in order, while they fit
+            fitted = []
+            for sentence in novel:
+                cost = estimate_tokens(sentence) + 1
+                if cost > budget:
+                    break
+                fitted.append(sentence)
+                budget -= cost
+            if not fitted:
+                dropped["budget"] += 1
+                continue
+
+            seen_sentences.update(" ".join(_WORD.findall(s.lower())) for s in fitted)
+            chosen_shingles.append(shingles)
+            selected.append((id, " ".join(fitted), distance))
+
+        stats = {
+            "candidates": len(hits["ids"]),
+            "selected": len(selected),
+            "dropped": dropped,
+            "tokens": self.max_tokens - budget
+        }
+        return selected, stats
+
+    def build(self, hits):
+        """Context text for hits from ChromaDBHandler.retrieve"""
+        selected, _ = self.select(hits)
+        return "\n\n".join(text for _, text, _ in selected)
+
+    @staticmethod
+    def fit_history(entries, max_tokens, max_entries=10):
+        """The most recent non-empty history entries that fit in max_tokens, oldest first"""
+        kept = []
+        for entry in reversed([entry for entry in entries if entry][-max_entries:]):
+            cost = estimate_tokens(entry) + 1
+            if cost > max_tokens:
+                break
+            kept.append(entry)
+            max_tokens -= cost
+        return kept[::-1]
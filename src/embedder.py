@@ -1,10 +1,74 @@
 # embedder.py
 from sentence_transformers import SentenceTransformer
 import numpy as np
+from src.embedding_cache import EmbeddingCache
 
 class TextEmbedder:
-    def __init__(self, model_name="all-mpnet-base-v2"):
+    def __init__(self, model_name="all-mpnet-base-v2", batch_size=64, normalize=False,
+                 cache_dir="cache/embeddings", cache_capacity=50000):
         self.model = SentenceTransformer(model_name)
-        
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.normalize = normalize
+        # Embeddings are deterministic per (model, text), so keep them on disk across rebuilds
+        self.cache = None
+        if cache_dir:
+            self.cache = EmbeddingCache(model_name, self.model.get_sentence_embedding_dimension(),
+                                        directory=cache_dir, capacity=cache_capacity)
+
     def embed(self, text: str) -> np.ndarray:
-        return self.model.encode(text, convert_to_tensor=False)
\ No newline at end of file
+        return self.model.encode(text, convert_to_tensor=False)
+
+    def embed_batch(self, texts, batch_size=None, normalize=None, sort_by_length=True) -> np.ndarray:
+        """
+        Encode many texts in mini-batches into one contiguous float32 matrix.
+        Rows are returned in the same order as `texts`.
+
+        With sort_by_length, texts are bucketed by length before encoding so
+        each mini-batch pads to a similar size, then scattered back in place.
+        """
+        texts = list(texts)
+        batch_size = batch_size or self.batch_size
+        normalize = self.normalize if normalize is None else normalize
+
+        dim = self.model.get_sentence_embedding_dimension()
+        out = np.empty((len(texts), dim), dtype=np.float32)
+        if not texts:
+            return out
+
+        if self.cache is None:
+            self._encode_into(out, texts, np.arange(len(texts)), batch_size, normalize, sort_by_length)
+            return out
+
+        keys = [self.cache.make_key(text, self.model_name, normalize) for text in texts]
+        found = self.cache.get_many(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in found:
+                out[i] = found[key]
+            else:
+                missing.append(i)
+        if missing:
+            self._encode_into(out, texts, np.array(missing), batch_size, normalize, sort_by_length)
+            self.cache.put_many([keys[i] for i in missing], out[missing])
+        return out
+
+    def _encode_into(self, out, texts, rows, batch_size, normalize, sort_by_length):
+        """Encode texts[rows] into out[rows], one mini-batch at a time"""
+        if sort_by_length:
+            rows = rows[np.argsort([-len(texts[i]) for i in rows], kind="stable")]
+
+        for start in range(0, len(rows), batch_size):
+            idx = rows[start:start + batch_size]
+            encoded = self.model.encode(
+                [texts[i] for i in idx],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=normalize,
+                show_progress_bar=False
+            )
+            out[idx] = encoded
+
+    def cache_stats(self):
+        """Hit/miss counters and size of the on-disk embedding cache"""
+        return self.cache.stats() if self.cache is not None else {}
@@ -0,0 +1,130 @@
+# embedding_cache.py
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+from src.blob_cache import content_key, hit_stats
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embeddings for one model.
+    Vectors live in a fixed-capacity memory-mapped array; a SQLite index
+    maps text hashes to rows. When the array is full the least recently
+    used rows are reused. Keys and hit counting are shared with BlobCache;
+    the vectors themselves stay out of SQLite so lookups are array reads.
+    """
+
+    def __init__(self, model_name, dim, directory="cache/embeddings", capacity=50000, dtype=np.float32):
+        os.makedirs(directory, exist_ok=True)
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        base = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        vectors_path = base + ".vectors"
+        self._conn = sqlite3.connect(base + ".index.db", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used)")
+
+        layout = f"{dim}:{capacity}:{self.dtype.str}"
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'layout'").fetchone()
+        if row is None or row[0] != layout or not os.path.exists(vectors_path):
+            # New cache, or the array shape changed: start from an empty index
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('layout', ?)", (layout,))
+            self.vectors = np.memmap(vectors_path, dtype=self.dtype, mode="w+", shape=(capacity, dim))
+        else:
+            self.vectors = np.memmap(vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, dim))
+        self._conn.commit()
+
+        # Rows are handed out in order up to a high-water mark; holes below it (none unless the
+        # index was edited outside this class) are found once here instead of on every allocation
+        taken = {slot for (slot,) in self._conn.execute("SELECT slot FROM entries")}
+        self._next_slot = max(taken) + 1 if taken else 0
+        self._free = [slot for slot in range(self._next_slot) if slot not in taken]
+
+    @staticmethod
+    def make_key(text, *parts):
+        return content_key(*parts, text)
+
+    def _lookup_slots(self, keys):
+        slots = {}
+        for start in range(0, len(keys), 500):
+            batch = list(keys[start:start + 500])
+            slots.update(self._conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return slots
+
+    def get_many(self, keys):
+        """Return {key: float32 vector} for the keys present in the cache"""
+        found = {}
+        if not keys:
+            return found
+        with self._lock:
+            for key, slot in self._lookup_slots(keys).items():
+                found[key] = np.asarray(self.vectors[slot], dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys, vectors):
+        if not len(keys):
+            return
+        with self._lock:
+            now = time.time()
+            assigned = self._lookup_slots(keys)
+            # Touch rows being rewritten so eviction below never picks them
+            self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                   [(now, key) for key in assigned])
+            new_keys = [key for key in dict.fromkeys(keys) if key not in assigned]
+            assigned.update(zip(new_keys, self._free_slots(len(new_keys))))
+            for key, vector in zip(keys, vectors):
+                if key in assigned:
+                    self.vectors[assigned[key]] = vector
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in assigned.items()]
+            )
+            self._conn.commit()
+            self.vectors.flush()
+
+    def _free_slots(self, count):
+        """Pick `count` rows to write, evicting least recently used entries when full"""
+        count = min(count, self.capacity)
+        slots = self._free[:count]
+        del self._free[:count]
+        fresh = min(count - len(slots), self.capacity - self._next_slot)
+        slots += range(self._next_slot, self._next_slot + fresh)
+        self._next_slot += fresh
+        if len(slots) < count:
+            evicted = self._conn.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (count - len(slots),)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+            slots += [slot for _, slot in evicted]
+        return slots
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {**hit_stats(self.hits, self.misses), "entries": entries, "capacity": self.capacity}
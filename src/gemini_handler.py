@@ -1,15 +1,54 @@
 # gemini_handler.py
-import google.generativeai as genai
 import json
 import re
 
+# Bump whenever the summary prompts change so cached summaries are not reused
+PROMPT_VERSION = "1"
+
+
+class QuotaExceededError(Exception):
+    """Raised by a processor when the API reports a rate limit / quota error"""
+
+
+def is_quota_error(error):
+    """Best-effort check for rate-limit errors from google-generativeai"""
+    if isinstance(error, QuotaExceededError):
+        return True
+    name = type(error).__name__
+    message = str(error).lower()
+    return (name in ("ResourceExhausted", "TooManyRequests")
+            or "429" in message
+            or "quota" in message
+            or "rate limit" in message)
+
+
 class GeminiProcessor:
-    def __init__(self, api_key):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash',
-            generation_config={"response_mime_type": "application/json"})
-    
-    def process_chunk(self, text_chunk):
+    def __init__(self, api_key, model=None, model_name='gemini-2.0-flash', cache=None):
+        # `model` lets callers pass a stand-in for genai.GenerativeModel
+        if model is None:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(model_name,
+                generation_config={"response_mime_type": "application/json"})
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def _cache_key(self, text_chunk):
+        return self.cache.make_key(text_chunk, PROMPT_VERSION, self.model_name)
+
+    def cached(self, text_chunk):
+        """Return the cached summary for a chunk, or None"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self._cache_key(text_chunk))
+
+    def process_chunk(self, text_chunk, raise_on_quota=False, check_cache=True):
+        if check_cache and self.cache is not None:
+            cached = self.cache.get(self._cache_key(text_chunk))
+            if cached is not None:
+                return cached
+
         prompt = f"""
     Please analyze the following text and extract key information. Return the results as a JSON object with the following structure:
 
@@ -29,12 +68,130 @@ class GeminiProcessor:
             response = self.model.generate_content(prompt)
             # Clean response and extract JSON
             clean_response = self._extract_json(response.text)
-            return json.loads(clean_response)
+            result = json.loads(clean_response)
+            if self.cache is not None:
+                self.cache.put(self._cache_key(text_chunk), result)
+            return result
         except Exception as e:
+            if raise_on_quota and is_quota_error(e):
+                raise
             print(f"Gemini API Error: {e}")
             print(f"Raw response: {response.text if 'response' in locals() else ''}")
             return None
 
+    def process_chunks(self, chunks, max_chars_per_request=12000, raise_on_quota=False, check_cache=True):
+        """
+        Summarize several chunks per request to save on request count and
+        repeated prompt headers. Returns one result per chunk, in order.
+        Entries the model drops, duplicates or can't be matched to a chunk
+        index are retried on their own through process_chunk.
+        """
+        chunks = list(chunks)
+        results = [None] * len(chunks)
+        pending = list(range(len(chunks)))
+        if check_cache and self.cache is not None:
+            for i in range(len(chunks)):
+                results[i] = self.cached(chunks[i])
+            pending = [i for i in pending if results[i] is None]
+
+        misses = [chunks[i] for i in pending]
+        miss_results = [None] * len(misses)
+        for group in self.pack_chunks(misses, max_chars_per_request):
+            self._process_group(misses, group, miss_results, raise_on_quota)
+        for i, result in zip(pending, miss_results):
+            results[i] = result
+        return results
+
+    def pack_chunks(self, chunks, max_chars):
+        """Greedily pack chunk indices into groups of at most max_chars text"""
+        groups = []
+        current = []
+        current_chars = 0
+        for i, chunk in enumerate(chunks):
+            if current and current_chars + len(chunk) > max_chars:
+                groups.append(current)
+                current = []
+                current_chars = 0
+            current.append(i)
+            current_chars += len(chunk)
+        if current:
+            groups.append(current)
+        return groups
+
+    def _process_group(self, chunks, group, results, raise_on_quota):
+        if len(group) == 1:
+            i = group[0]
+            results[i] = self.process_chunk(chunks[i], raise_on_quota=raise_on_quota, check_cache=False)
+            return
+
+        sections = "\n\n".join(f"[Chunk {i}]\n{chunks[i]}" for i in group)
+        prompt = f"""
+    Please analyze each of the following text chunks separately and extract key information. Return the results as a JSON array containing exactly one object per chunk, in the same order, with the following structure:
+
+    [
+      {{
+        "index": <the chunk number shown in its [Chunk N] header>,
+        "key_points": ["List of main ideas, figures, or significant details with their context."],
+        "summary": "A concise summary of the chunk, limited to 50 words and focusing on the most important information.",
+        "keywords": ["List of relevant keywords extracted from the chunk."]
+      }}
+    ]
+
+    Chunks:
+    {sections}
+
+    Respond with the JSON array ONLY. Do not include any additional text or explanations.
+    """
+
+        try:
+            response = self.model.generate_content(prompt)
+            entries = self._parse_batch(response.text)
+        except Exception as e:
+            if raise_on_quota and is_quota_error(e):
+                raise
+            print(f"Gemini batch error ({len(group)} chunks): {e}")
+            entries = None
+
+        if entries is None:
+            # Unusable response: split the group and try each half again
+            mid = len(group) // 2
+            self._process_group(chunks, group[:mid], results, raise_on_quota)
+            self._process_group(chunks, group[mid:], results, raise_on_quota)
+            return
+
+        matched = {}
+        duplicates = set()
+        for entry in entries:
+            index = entry.get("index") if isinstance(entry, dict) else None
+            if index not in group or "summary" not in entry:
+                continue
+            if index in matched:
+                duplicates.add(index)
+            matched[index] = {key: entry.get(key) for key in ("key_points", "summary", "keywords")}
+
+        for i in group:
+            if i in matched and i not in duplicates:
+                results[i] = matched[i]
+                if self.cache is not None:
+                    self.cache.put(self._cache_key(chunks[i]), matched[i])
+            else:
+                results[i] = self.process_chunk(chunks[i], raise_on_quota=raise_on_quota, check_cache=False)
+
+    def _parse_batch(self, text):
+        """Parse a batch response into a list of entries, or None if unusable"""
+        text = re.sub(r'```json|```', '', text).strip()
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                data = json.loads(self._extract_json(text))
+            except json.JSONDecodeError:
+                return None
+        if isinstance(data, dict):
+            # Some responses wrap the array, e.g. {"chunks": [...]}
+            data = next((v for v in data.values() if isinstance(v, list)), None)
+        return data if isinstance(data, list) else None
+
     def _extract_json(self, text):
         """Handle common Gemini response formatting issues"""
         # Remove markdown code blocks
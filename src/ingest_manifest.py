@@ -0,0 +1,61 @@
+# ingest_manifest.py
+import hashlib
+import json
+import os
+
+
+def content_hash(text, length=16):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:length]
+
+
+def document_id(name):
+    """Stable ID for a document, derived from its original file name"""
+    return content_hash(os.path.basename(name))
+
+
+def chunk_id(doc_id, chunk):
+    """Stable ID for a chunk, derived from its document and its text"""
+    return f"{doc_id}_{content_hash(chunk)}"
+
+
+class IngestManifest:
+    """
+    JSON record of which chunk IDs are indexed for each document, used to
+    turn re-ingestion into a diff against what is already in the collection.
+    """
+
+    def __init__(self, path="cache/manifest.json"):
+        self.path = path
+        self.documents = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.documents = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Could not read manifest {path}: {e}")
+
+    def diff(self, doc_id, chunk_ids):
+        """
+        Compare a document's current chunk IDs with the indexed ones.
+        Returns (added, unchanged, removed) as lists of IDs.
+        """
+        indexed = set(self.documents.get(doc_id, {}).get("chunks", []))
+        current = list(dict.fromkeys(chunk_ids))
+        added = [c for c in current if c not in indexed]
+        unchanged = [c for c in current if c in indexed]
+        removed = sorted(indexed.difference(current))
+        return added, unchanged, removed
+
+    def update(self, doc_id, name, chunk_ids):
+        self.documents[doc_id] = {"name": name, "chunks": list(chunk_ids)}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.documents, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.documents = {}
+        self.save()
@@ -0,0 +1,421 @@
+# ingest_pipeline.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.ingest_manifest import document_id, chunk_id
+from src.pdf_processor import DocumentProcessor
+
+_DONE = object()
+
+
+def _extract_segments(path):
+    """Read a file into its list of text segments - runs inside worker processes"""
+    started = time.perf_counter()
+    segments = list(DocumentProcessor(max_workers=1).iter_segments(path))
+    return segments, time.perf_counter() - started
+
+
+class StageStats:
+    """Items processed and busy time for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.busy += seconds
+
+    def as_dict(self):
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy, 3),
+            "items_per_second": round(self.items / self.busy, 2) if self.busy else 0.0
+        }
+
+
+class FileProgress:
+    """Per-file state shared between stages and reported to the progress callback"""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.doc_id = document_id(name)
+        self.stage = "queued"
+        self.ids = []
+        self.stored = set()
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.error = None
+        self.finished = False
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "stage": self.stage,
+            "chunks_done": self.chunks_done,
+            "chunks_total": self.chunks_total,
+            "added": len(self.stored) - self.unchanged,
+            "unchanged": self.unchanged,
+            "removed": self.removed,
+            "error": self.error
+        }
+
+
+class _ChunkItem:
+    __slots__ = ("file", "index", "chunk", "summary", "embedding")
+
+    def __init__(self, file, index, chunk):
+        self.file = file
+        self.index = index
+        self.chunk = chunk
+        self.summary = None
+        self.embedding = None
+
+
+class IngestPipeline:
+    """
+    Multi-file ingestion as a chain of stages joined by bounded queues:
+    extract (process pool) -> chunk + manifest diff -> summarize (threads,
+    several chunks per Gemini request) -> embed (batches) -> bulk write.
+    Files move through independently, so a slow or broken file does not
+    hold up the others.
+
+    Progress callbacks run on the thread that called run(), which keeps
+    them safe to use with Streamlit elements.
+    """
+
+    def __init__(self, doc_processor, summarizer, db_handler, manifest,
+                 extract_workers=2, summarize_workers=None, embed_batch_size=64, queue_size=256):
+        self.doc_processor = doc_processor
+        self.summarizer = summarizer
+        self.db_handler = db_handler
+        self.embedder = db_handler.embedding_fn.embedder
+        self.manifest = manifest
+        self.extract_workers = extract_workers
+        # Defaults to the summarizer's own concurrency (SUMMARY_CONCURRENCY in the UI)
+        self.summarize_workers = summarize_workers or getattr(summarizer, "max_workers", 8)
+        self.embed_batch_size = embed_batch_size
+        self.queue_size = queue_size
+        self.stats = {name: StageStats(name) for name in ("extract", "chunk", "summarize", "embed", "write")}
+
+    def run(self, uploads, on_progress=None):
+        """
+        Ingest [(name, path), ...]. on_progress(doc_id, progress_dict) is
+        called whenever a file changes stage or finishes a chunk; the dict
+        carries the file's "name". Returns {doc_id: progress_dict} once every
+        file is finished. Uploads sharing a name are told apart as
+        "name (2).ext" and so on, so each gets its own document ID.
+        """
+        files = []
+        seen = {}
+        for name, path in uploads:
+            seen[name] = seen.get(name, 0) + 1
+            if seen[name] > 1:
+                root, ext = os.path.splitext(name)
+                name = f"{root} ({seen[name]}){ext}"
+            files.append(FileProgress(name, path))
+        if not files:
+            return {}
+        self._events = queue.Queue()
+        self._chunk_q = queue.Queue(maxsize=max(1, self.extract_workers * 2))
+        self._summarize_q = queue.Queue(maxsize=self.queue_size)
+        self._embed_q = queue.Queue(maxsize=self.queue_size)
+        self._write_q = queue.Queue(maxsize=self.queue_size)
+        self._summarizers_left = self.summarize_workers
+        self._lock = threading.Lock()
+        self._crashed = None
+
+        threads = [
+            self._stage_thread(self._extract_stage, None, files),
+            self._stage_thread(self._chunk_stage, self._chunk_q),
+            self._stage_thread(self._embed_stage, self._embed_q),
+            self._stage_thread(self._write_stage, self._write_q),
+        ]
+        threads += [self._stage_thread(self._summarize_stage, self._summarize_q)
+                    for _ in range(self.summarize_workers)]
+        for thread in threads:
+            thread.start()
+
+        remaining = len(files)
+        while remaining and self._crashed is None:
+            try:
+                file = self._events.get(timeout=0.5)
+            except queue.Empty:
+                if not any(thread.is_alive() for thread in threads):
+                    break
+                continue
+            if on_progress:
+                on_progress(file.doc_id, file.as_dict())
+            if file.finished:
+                remaining -= 1
+
+        if self._crashed is None:
+            for thread in threads:
+                thread.join()
+        for file in files:
+            # Whatever a crashed stage left behind will never finish
+            if not file.finished:
+                file.error = file.error or f"ingestion stopped: {self._crashed or 'pipeline ended early'}"
+                file.stage = "failed"
+                file.finished = True
+                if on_progress:
+                    on_progress(file.doc_id, file.as_dict())
+        return {file.doc_id: file.as_dict() for file in files}
+
+    def stage_stats(self):
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def _notify(self, file, stage=None):
+        if stage:
+            file.stage = stage
+        self._events.put(file)
+
+    def _fail(self, file, error):
+        print(f"Ingestion failed for {file.name}: {error}")
+        file.error = str(error)
+        file.finished = True
+        self._notify(file, "failed")
+
+    def _stage_thread(self, stage, inbox, *args):
+        """
+        Thread running one stage. Stages fail single files on per-item
+        errors and always pass _DONE on; if a stage still crashes, run() is
+        told to stop waiting and the dead stage keeps emptying its inbox so
+        the stages feeding it never block on a full queue.
+        """
+        def run():
+            try:
+                stage(*args)
+            except Exception as e:
+                print(f"Ingest stage {stage.__name__} crashed: {e}")
+                self._crashed = e
+                if inbox is not None:
+                    while inbox.get() is not _DONE:
+                        pass
+
+        return threading.Thread(target=run, name=stage.__name__, daemon=True)
+
+    def _extract_stage(self, files):
+        try:
+            with ProcessPoolExecutor(max_workers=self.extract_workers) as executor:
+                futures = {}
+                for file in files:
+                    self._notify(file, "extracting")
+                    futures[executor.submit(_extract_segments, file.path)] = file
+                # Hand files on as they finish so a slow file doesn't hold up the rest
+                for future in as_completed(futures):
+                    file = futures[future]
+                    try:
+                        segments, seconds = future.result()
+                    except Exception as e:
+                        self._fail(file, e)
+                        continue
+                    self.stats["extract"].record(1, seconds)
+                    self._chunk_q.put((file, segments))
+        finally:
+            self._chunk_q.put(_DONE)
+
+    def _chunk_stage(self):
+        try:
+            while True:
+                item = self._chunk_q.get()
+                if item is _DONE:
+                    break
+                file, segments = item
+                try:
+                    self._chunk_file(file, segments)
+                except Exception as e:
+                    self._fail(file, e)
+        finally:
+            for _ in range(self.summarize_workers):
+                self._summarize_q.put(_DONE)
+
+    def _chunk_file(self, file, segments):
+        self._notify(file, "chunking")
+        started = time.perf_counter()
+        # Content-defined chunks keep their IDs across edits elsewhere in the file
+        chunks = list(self.doc_processor.iter_chunks(segments, content_defined=True))
+        self.stats["chunk"].record(len(chunks), time.perf_counter() - started)
+
+        file.ids = [chunk_id(file.doc_id, chunk) for chunk in chunks]
+        added, unchanged, removed = self.manifest.diff(file.doc_id, file.ids)
+        first_index = {}
+        for i, cid in enumerate(file.ids):
+            first_index.setdefault(cid, i)
+        file.stored.update(unchanged)
+        file.unchanged = len(unchanged)
+        file.removed = len(removed)
+        # Set the total before queueing so the writer can tell when a file is complete
+        file.chunks_total = len(added)
+
+        self._write_q.put(("delete", file, removed))
+        self._notify(file, "summarizing")
+        for cid in added:
+            i = first_index[cid]
+            self._summarize_q.put(_ChunkItem(file, i, chunks[i]))
+        self._write_q.put(("check", file, None))
+
+    def _summarize_stage(self):
+        limit = getattr(self.summarizer, "max_chars_per_request", None)
+        done = False
+        try:
+            while not done:
+                item = self._summarize_q.get()
+                if item is _DONE:
+                    break
+                # Take whatever else is already queued, up to one batched request's worth
+                batch = [item]
+                size = len(item.chunk)
+                while limit and size < limit:
+                    try:
+                        item = self._summarize_q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        done = True
+                        break
+                    batch.append(item)
+                    size += len(item.chunk)
+
+                started = time.perf_counter()
+                try:
+                    results = self.summarizer.summarize_batch([item.chunk for item in batch])
+                except Exception as e:
+                    print(f"Summarization failed for {len(batch)} chunks: {e}")
+                    results = [None] * len(batch)
+                for item, result in zip(batch, results):
+                    if isinstance(result, dict) and result.get("summary"):
+                        item.summary = result["summary"]
+                self.stats["summarize"].record(len(batch), time.perf_counter() - started)
+                for item in batch:
+                    self._embed_q.put(item)
+        finally:
+            with self._lock:
+                self._summarizers_left -= 1
+                last = self._summarizers_left == 0
+            if last:
+                self._embed_q.put(_DONE)
+
+    def _embed_stage(self):
+        batch = []
+        done = False
+        try:
+            while not done:
+                try:
+                    item = self._embed_q.get(timeout=0.2 if batch else None)
+                except queue.Empty:
+                    item = None
+                if item is _DONE:
+                    done = True
+                elif item is not None:
+                    batch.append(item)
+                    if len(batch) < self.embed_batch_size:
+                        continue
+                if batch:
+                    self._embed_batch(batch)
+                    batch = []
+        finally:
+            self._write_q.put(_DONE)
+
+    def _embed_batch(self, batch):
+        started = time.perf_counter()
+        todo = [item for item in batch if item.summary is not None]
+        if todo:
+            try:
+                embeddings = self.embedder.embed_batch([item.summary for item in todo])
+                for item, embedding in zip(todo, embeddings):
+                    item.embedding = embedding.tolist()
+            except Exception as e:
+                # Leave embeddings unset; Chroma will embed these rows itself on write
+                print(f"Batch embedding failed: {e}")
+        self.stats["embed"].record(len(todo), time.perf_counter() - started)
+        for item in batch:
+            self._write_q.put(item)
+
+    def _write_stage(self):
+        buffered = {}  # chunk ID -> file, for rows the writer holds but has not written yet
+
+        def written(ids):
+            for cid in ids:
+                file = buffered.pop(cid, None)
+                if file is not None:
+                    file.stored.add(cid)
+
+        writer = self.db_handler.bulk_writer(on_written=written)
+        self._buffered = buffered
+        pending_files = set()
+        while True:
+            item = self._write_q.get()
+            if item is _DONE:
+                if pending_files:
+                    try:
+                        writer.flush()
+                    except Exception as e:
+                        self._flush_failed(e, writer, pending_files)
+                break
+            file = item[1] if isinstance(item, tuple) else item.file
+            try:
+                self._write_item(item, writer, pending_files)
+            except Exception as e:
+                if not file.finished:
+                    self._fail(file, e)
+
+    def _write_item(self, item, writer, pending_files):
+        started = time.perf_counter()
+        if isinstance(item, tuple):
+            action, file, ids = item
+            if action == "delete" and ids and not file.finished:
+                try:
+                    self.db_handler.delete_documents(ids)
+                except Exception as e:
+                    print(f"Failed to delete stale chunks for {file.name}: {e}")
+            self._maybe_finish(file, writer, pending_files)
+            return
+
+        file = item.file
+        if item.summary is not None and not file.finished:
+            pending_files.add(file)
+            # Counted as stored only once the writer has actually written it
+            self._buffered[file.ids[item.index]] = file
+            try:
+                writer.add(item.summary, {"source": file.name, "doc_id": file.doc_id, "chunk": item.index},
+                           file.ids[item.index], item.embedding)
+            except Exception as e:
+                self._flush_failed(e, writer, pending_files)
+        file.chunks_done += 1
+        self.stats["write"].record(1, time.perf_counter() - started)
+        self._maybe_finish(file, writer, pending_files)
+        self._notify(file)
+
+    def _maybe_finish(self, file, writer, pending_files):
+        if file.finished or file.stage != "summarizing" or file.chunks_done < file.chunks_total:
+            return
+        if file in pending_files:
+            try:
+                writer.flush()
+                pending_files.clear()
+            except Exception as e:
+                self._flush_failed(e, writer, pending_files)
+                return
+        # Chunks that failed to summarize stay out of the manifest and are retried next time
+        self.manifest.update(file.doc_id, file.name, [cid for cid in dict.fromkeys(file.ids) if cid in file.stored])
+        self.manifest.save()
+        file.finished = True
+        self._notify(file, "done")
+
+    def _flush_failed(self, error, writer, pending_files):
+        writer.discard()
+        self._buffered.clear()
+        for file in pending_files:
+            if not file.finished:
+                self._fail(file, error)
+        pending_files.clear()
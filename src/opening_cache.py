@@ -0,0 +1,55 @@
+# opening_cache.py
+import threading
+
+
+class OpeningCache:
+    """
+    Opening pitches prepared ahead of a call.
+    Entries are keyed by (knowledge base version, client name) and built on
+    a background thread, so starting a call only has to look one up.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, key, build):
+        """Start building the entry for `key` in the background unless it exists or is in progress"""
+        with self._lock:
+            if key in self._entries or key in self._pending:
+                return
+            done = threading.Event()
+            self._pending[key] = done
+
+        def run():
+            try:
+                entry = build()
+            except Exception as e:
+                print(f"Failed to prepare opening: {e}")
+                entry = None
+            with self._lock:
+                if entry is not None:
+                    # Openings for older knowledge base versions can't be used again
+                    version, client_name = key
+                    for old in [k for k in self._entries if k[1] == client_name and k[0] != version]:
+                        del self._entries[old]
+                    self._entries[key] = entry
+                del self._pending[key]
+            done.set()
+
+        threading.Thread(target=run, name="prepare-opening", daemon=True).start()
+
+    def get(self, key, wait=True):
+        """
+        Return the entry for `key`, or None if there isn't one.
+        If it is still being built and wait is set, block until it is done.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            pending = self._pending.get(key)
+        if entry is None and pending is not None and wait:
+            pending.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+        return entry
@@ -1,26 +1,33 @@
 # pdf_processor.py
 import os
-import PyPDF2
-import docx2txt
-import nltk
-from nltk.tokenize import sent_tokenize
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from src.resources import ensure_nltk_data
+
+
+def sent_tokenize(text):
+    """nltk.sent_tokenize, importing NLTK and checking its data on first use"""
+    ensure_nltk_data()
+    from nltk.tokenize import sent_tokenize as nltk_sent_tokenize
+    return nltk_sent_tokenize(text)
+
+
+def _extract_pdf_pages(file_path, start, stop):
+    """Extract text for pages [start, stop) - runs inside worker processes"""
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, pages_per_task=8, parallel_min_pages=32, max_workers=None):
         self.supported_formats = ['.pdf', '.docx', '.txt']
-        self._initialize_nltk()
-
-    def _initialize_nltk(self):
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            print("Downloading NLTK punkt data...")
-            nltk.download('punkt')
-        try:
-            nltk.data.find('tokenizers/punkt_tab')
-        except LookupError:
-            print("Downloading NLTK punkt_tab data...")
-            nltk.download('punkt_tab')
+        # PDFs with at least parallel_min_pages pages are extracted on a process pool
+        self.pages_per_task = pages_per_task
+        self.parallel_min_pages = parallel_min_pages
+        self.max_workers = max_workers or os.cpu_count() or 1
 
     def read_file(self, file_path):
         ext = os.path.splitext(file_path)[1].lower()
@@ -34,15 +41,50 @@ class DocumentProcessor:
         else:
             raise ValueError(f"Unsupported file format: {ext}")
 
-    def _read_pdf(self, file_path):
-        text = ""
+    def iter_segments(self, file_path):
+        """
+        Yield a document's text as a stream of segments: one per page for
+        PDFs, the whole text for other formats. Joining the segments gives
+        the same text as read_file.
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext == '.pdf':
+            yield from self.iter_pages(file_path)
+        else:
+            yield self.read_file(file_path)
+
+    def iter_pages(self, file_path):
+        """
+        Yield PDF page texts in page order.
+        Large PDFs are split into page ranges extracted on a process pool;
+        only a few ranges are in flight at once so memory stays bounded.
+        """
+        import PyPDF2
         with open(file_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
-            for page in reader.pages:
-                text += page.extract_text()
-        return text
+            num_pages = len(reader.pages)
+            if num_pages < self.parallel_min_pages or self.max_workers < 2:
+                for page in reader.pages:
+                    yield page.extract_text() or ""
+                return
+
+        ranges = [(start, min(start + self.pages_per_task, num_pages))
+                  for start in range(0, num_pages, self.pages_per_task)]
+        max_in_flight = self.max_workers * 2
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for start, stop in ranges:
+                pending.append(executor.submit(_extract_pdf_pages, file_path, start, stop))
+                if len(pending) >= max_in_flight:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _read_pdf(self, file_path):
+        return "".join(self.iter_pages(file_path))
 
     def _read_docx(self, file_path):
+        import docx2txt
         return docx2txt.process(file_path)
 
     def _read_txt(self, file_path):
@@ -55,10 +97,15 @@ class DocumentProcessor:
                 continue
         raise UnicodeDecodeError(f"Failed to decode {file_path} with tried encodings")
 
-    def chunk_text(self, text, chunk_size=1000, overlap=200):
+    def chunk_text(self, text, chunk_size=1000, overlap=200, content_defined=False):
         """
         Split text into chunks that preserve sentence boundaries
-        with configurable overlap between chunks
+        with configurable overlap between chunks.
+
+        With content_defined, chunks end at content-defined cut points
+        instead (see _SentenceChunker), so editing one passage only changes
+        the chunks around it; chunks come out smaller, so there are more of
+        them.
         """
         try:
             sentences = sent_tokenize(text)
@@ -66,36 +113,75 @@ class DocumentProcessor:
             print(f"Error in sentence tokenization: {e}")
             # Fallback to simple chunking if tokenization fails
             return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-        
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        overlap_buffer = []
 
-        for sentence in sentences:
-            sentence_length = len(sentence)
-            
-            # If adding this sentence would exceed chunk size
-            if current_length + sentence_length > chunk_size:
-                if current_chunk:
-                    # Save current chunk
-                    chunks.append(" ".join(current_chunk))
-                    
-                    # Preserve overlap for next chunk
-                    overlap_buffer = current_chunk[-self._num_overlap_sentences(current_chunk, overlap):]
-                    current_chunk = overlap_buffer.copy()
-                    current_length = sum(len(s) for s in current_chunk)
-                
-            # Add sentence to current chunk
-            current_chunk.append(sentence)
-            current_length += sentence_length
-
-        # Add the final chunk
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-            
+        chunker = _SentenceChunker(chunk_size, overlap, self._num_overlap_sentences, content_defined)
+        chunks = list(chunker.feed(sentences))
+        chunks.extend(chunker.finish())
         return chunks
 
+    def iter_chunks(self, segments, chunk_size=1000, overlap=200, block_size=65536, content_defined=False):
+        """
+        Streaming version of chunk_text over an iterable of text segments
+        (e.g. iter_segments). Yields each chunk as soon as it is complete and
+        produces the same chunks as chunk_text("".join(segments), ...).
+
+        Text is tokenized a block at a time; the last two sentences of each
+        block are held back and re-tokenized with the following text, since
+        the boundary between them can change once more text arrives. When
+        the held-back sentences run on for more than two blocks, only the
+        new block and the block before it are tokenized, to look for a new
+        sentence break, so the cost per block stays bounded.
+        """
+        chunker = _SentenceChunker(chunk_size, overlap, self._num_overlap_sentences, content_defined)
+        buffer = ""
+        remainder = ""
+        held = 0  # sentences in buffer as of the last full tokenization
+        segments = iter(segments)
+        try:
+            for segment in segments:
+                for start in range(0, len(segment), block_size):
+                    scanned = len(buffer)
+                    buffer += segment[start:start + block_size]
+                    remainder = segment[start + block_size:]
+                    if scanned > 2 * block_size:
+                        held += self._new_breaks(buffer, scanned, block_size)
+                        if held <= 2:
+                            continue
+                    sentences = sent_tokenize(buffer)
+                    held = min(len(sentences), 2)
+                    if len(sentences) > 2:
+                        last = buffer.rfind(sentences[-1])
+                        buffer = buffer[buffer.rfind(sentences[-2], 0, last):]
+                        yield from chunker.feed(sentences[:-2])
+            sentences = sent_tokenize(buffer)
+        except Exception as e:
+            print(f"Error in sentence tokenization: {e}")
+            # Fallback to simple chunking of whatever has not been chunked yet
+            text = buffer + remainder + "".join(segments)
+            yield from (text[i:i+chunk_size] for i in range(0, len(text), chunk_size))
+            return
+        yield from chunker.feed(sentences)
+        yield from chunker.finish()
+
+    def _new_breaks(self, buffer, scanned, block_size):
+        """
+        Sentence breaks in buffer past the first `scanned` characters (give
+        or take half a block), found by tokenizing only the last block of
+        old text plus the new one. Breaks are decided by the text around
+        them, so text further back cannot gain one.
+        """
+        window_start = scanned - block_size
+        window = buffer[window_start:]
+        cutoff = block_size // 2
+        breaks = 0
+        position = 0
+        for i, sentence in enumerate(sent_tokenize(window)):
+            position = window.find(sentence, position)
+            if i and position >= cutoff:
+                breaks += 1
+            position += len(sentence)
+        return breaks
+
     def _num_overlap_sentences(self, sentences, overlap_size):
         """Calculate how many sentences to overlap based on target overlap size"""
         total = 0
@@ -105,4 +191,102 @@ class DocumentProcessor:
             count += 1
             if total >= overlap_size:
                 break
-        return count
\ No newline at end of file
+        return count
+
+
+class _SentenceChunker:
+    """
+    Incremental form of the chunk_text loop behind chunk_text and
+    iter_chunks. Keeps the current chunk in a deque with a running length,
+    so trimming to the overlap window and appending sentences are O(1) per
+    sentence.
+
+    By default a chunk ends only when the next sentence would take it past
+    chunk_size, exactly as chunk_text always has. Because those boundaries
+    depend on offsets, an edit near the start of a document shifts every
+    boundary after it.
+
+    With content_defined, chunk ends depend on the sentences themselves:
+    once a chunk holds at least min_size characters of new text, it ends
+    after any sentence whose hash is 0 mod cut_every, and it is only cut by
+    size when it would otherwise grow past chunk_size (sentences longer
+    than chunk_size are cut into chunk_size pieces). An edit then moves at
+    most the boundaries next to it (about 2 changed chunks per one-line
+    edit), at the cost of smaller chunks: on prose with ~100-character
+    sentences they average about 790 characters instead of 990, i.e. about
+    a third more chunks to summarize and embed.
+    """
+
+    def __init__(self, chunk_size, overlap, num_overlap_sentences, content_defined=False, min_size=None,
+                 cut_every=4):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.num_overlap_sentences = num_overlap_sentences
+        self.content_defined = content_defined
+        self.min_size = chunk_size * 2 // 5 if min_size is None else min_size
+        self.cut_every = cut_every
+        self.current_chunk = deque()
+        self.current_length = 0
+        self.new_length = 0  # characters added since the overlap carried over from the last chunk
+
+    def _pieces(self, sentences):
+        """Sentences, with any longer than chunk_size cut into chunk_size pieces"""
+        for sentence in sentences:
+            if len(sentence) <= self.chunk_size:
+                yield sentence
+            else:
+                for start in range(0, len(sentence), self.chunk_size):
+                    yield sentence[start:start + self.chunk_size]
+
+    def is_cut_point(self, sentence):
+        return zlib.crc32(sentence.encode("utf-8")) % self.cut_every == 0
+
+    def feed(self, sentences):
+        if self.content_defined:
+            yield from self._feed_content_defined(sentences)
+            return
+        for sentence in sentences:
+            sentence_length = len(sentence)
+
+            # If adding this sentence would exceed chunk size
+            if self.current_length + sentence_length > self.chunk_size and self.current_chunk:
+                yield from self._cut()
+
+            self.current_chunk.append(sentence)
+            self.current_length += sentence_length
+            self.new_length += sentence_length
+
+    def _feed_content_defined(self, sentences):
+        for sentence in self._pieces(sentences):
+            sentence_length = len(sentence)
+
+            if self.current_length + sentence_length > self.chunk_size:
+                if self.new_length:
+                    yield from self._cut()
+                if self.current_length + sentence_length > self.chunk_size:
+                    # Not even the overlap fits alongside this sentence
+                    self.current_chunk.clear()
+                    self.current_length = 0
+
+            self.current_chunk.append(sentence)
+            self.current_length += sentence_length
+            self.new_length += sentence_length
+
+            if self.new_length >= self.min_size and self.is_cut_point(sentence):
+                yield from self._cut()
+
+    def _cut(self):
+        yield " ".join(self.current_chunk)
+
+        # Preserve overlap for next chunk
+        keep = self.num_overlap_sentences(self.current_chunk, self.overlap)
+        while len(self.current_chunk) > keep:
+            self.current_length -= len(self.current_chunk.popleft())
+        self.new_length = 0
+
+    def finish(self):
+        if self.new_length if self.content_defined else self.current_chunk:
+            yield " ".join(self.current_chunk)
+        self.current_chunk = deque()
+        self.current_length = 0
+        self.new_length = 0
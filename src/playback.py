@@ -0,0 +1,57 @@
+# playback.py
+import subprocess
+import threading
+
+
+class InterruptiblePlayer:
+    """
+    Plays MP3/WAV audio through ffplay (the player elevenlabs.play uses) and
+    lets another thread cut the current playback off with stop(). Audio is
+    either bytes or an iterable of chunks, which are written to ffplay's
+    stdin as they arrive so playback starts with the first chunk.
+    """
+
+    def __init__(self, command=("ffplay", "-autoexit", "-nodisp", "-loglevel", "quiet",
+                                "-probesize", "32768", "-analyzeduration", "0", "-")):
+        # The small probe makes ffplay start on the first frames of a stream instead of buffering it
+        self.command = list(command)
+        self._process = None
+        self._lock = threading.Lock()
+
+    def play(self, audio):
+        """Block until `audio` (bytes or chunks) has played; returns False if it was stopped early"""
+        process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with self._lock:
+            self._process = process
+        chunks = [audio] if isinstance(audio, (bytes, bytearray)) else audio
+        try:
+            for chunk in chunks:
+                if process.poll() is not None:
+                    break  # stopped
+                process.stdin.write(chunk)
+                process.stdin.flush()
+        except BrokenPipeError:
+            pass  # stop() killed ffplay mid-write
+        finally:
+            # Also when the chunk stream fails midway: ffplay plays what it got and exits
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.wait()
+            with self._lock:
+                if self._process is process:
+                    self._process = None
+        return process.returncode == 0
+
+    def stop(self):
+        """Stop whatever is playing right now (no-op when idle)"""
+        with self._lock:
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    @property
+    def playing(self):
+        return self._process is not None
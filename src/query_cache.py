@@ -0,0 +1,98 @@
+# query_cache.py
+import re
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(text):
+    """Case- and whitespace-insensitive form of a query, used as the result cache key"""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class QueryCache:
+    """
+    Bounded LRU caches for query embeddings and query results.
+
+    Result entries are tied to the collection version; bump_version() is
+    called on every write so stale results are never served. Embeddings
+    only depend on the query text and survive writes.
+    """
+
+    def __init__(self, max_results=256, max_embeddings=1024):
+        self.max_results = max_results
+        self.max_embeddings = max_embeddings
+        self.version = 0
+        self._results = OrderedDict()
+        self._embeddings = OrderedDict()
+        self._lock = threading.Lock()
+        self.result_hits = 0
+        self.result_misses = 0
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+        self._latency = {"hit": [0, 0.0], "miss": [0, 0.0]}
+
+    def bump_version(self):
+        with self._lock:
+            self.version += 1
+            self._results.clear()
+
+    def get_results(self, key, n_results):
+        with self._lock:
+            entry = self._results.get((key, n_results, self.version))
+            if entry is None:
+                self.result_misses += 1
+                return None
+            self._results.move_to_end((key, n_results, self.version))
+            self.result_hits += 1
+            return entry
+
+    def put_results(self, key, n_results, version, results):
+        with self._lock:
+            # Drop results computed against a collection that has since changed
+            if version != self.version:
+                return
+            self._results[(key, n_results, version)] = results
+            self._results.move_to_end((key, n_results, version))
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def get_embedding(self, key):
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is None:
+                self.embedding_misses += 1
+                return None
+            self._embeddings.move_to_end(key)
+            self.embedding_hits += 1
+            return embedding
+
+    def put_embedding(self, key, embedding):
+        with self._lock:
+            self._embeddings[key] = embedding
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+
+    def record_latency(self, hit, seconds):
+        with self._lock:
+            bucket = self._latency["hit" if hit else "miss"]
+            bucket[0] += 1
+            bucket[1] += seconds
+
+    def stats(self):
+        with self._lock:
+            results = self.result_hits + self.result_misses
+            embeddings = self.embedding_hits + self.embedding_misses
+            return {
+                "version": self.version,
+                "result_hit_rate": self.result_hits / results if results else 0.0,
+                "embedding_hit_rate": self.embedding_hits / embeddings if embeddings else 0.0,
+                "result_entries": len(self._results),
+                "embedding_entries": len(self._embeddings),
+                "avg_hit_ms": self._avg_ms("hit"),
+                "avg_miss_ms": self._avg_ms("miss"),
+            }
+
+    def _avg_ms(self, kind):
+        count, total = self._latency[kind]
+        return total / count * 1000 if count else 0.0
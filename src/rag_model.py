@@ -1,23 +1,37 @@
 # rag_model.py
 import json
+from src.context_builder import ContextBuilder
+from src.response_stream import (END_CALL, ResponseStreamParser, SentenceSplitter,
+                                 could_be_end_call, is_end_call)
 
 
 class RAGModel:
-    def __init__(self, gemini_processor, db_handler):
+    def __init__(self, gemini_processor, db_handler, context_builder=None, history_tokens=300):
         self.gemini = gemini_processor
         self.db = db_handler
+        # Relevance-ranked, deduplicated context packed into a token budget
+        self.context_builder = context_builder or ContextBuilder()
+        self.history_tokens = history_tokens
         self.conversation_state = {}
 
     def fetch_context(self, query):
         """Retrieve relevant context from database"""
-        return self.db.query(query)
+        return self.context_from(self.retrieve(query))
+
+    def retrieve(self, query):
+        """Candidate matches for query with their ids and distances"""
+        return self.db.retrieve(query, n_results=self.context_builder.candidates)
+
+    def context_from(self, hits):
+        """The prompt context for hits returned by retrieve()"""
+        return self.context_builder.build(hits)
 
     def generate_opening(self, client_name="Sir/Ma'am"):
         """
         Generate initial marketing pitch using company information
         Returns structured response with suggested next steps
         """
-        context = self.db.query("company services overview")
+        context = self.fetch_context("company services overview")
         prompt = f"""Create a friendly opening pitch using this context: {context}
         Structure the response as JSON with these keys:
         {{
@@ -42,9 +56,67 @@ class RAGModel:
         Generate response to client questions with context awareness
         Maintains conversation history for continuity
         """
-        context = self.fetch_context(user_input)
+        prompt = self.response_prompt(user_input, conversation_history, audio_check)
+        response = self.gemini.model.generate_content(prompt)
+
+        raw_text = response.text.strip()
+        
+        print("\n\nresponse: ", response.text, "\n\n")
+        # Parse the JSON and extract the "response" key
+        try:
+            data = json.loads(raw_text)
+            return data.get("response", "")
+        except json.JSONDecodeError:
+            # If the JSON fails to parse, return the raw text
+            return {"response": raw_text}
+
+    def generate_response_stream(self, user_input, conversation_history=[], audio_check=False, context=None,
+                                 prompt=None):
+        """
+        Streaming form of generate_response: yields the reply one sentence at
+        a time while Gemini is still generating. If the reply is the end-call
+        sentinel, yields END_CALL alone instead of any sentences.
+        Pass `context` when retrieval has already been done for user_input,
+        or a `prompt` already built with response_prompt().
+        """
+        if prompt is None:
+            prompt = self.response_prompt(user_input, conversation_history, audio_check, context)
+        parser = ResponseStreamParser()
+        splitter = SentenceSplitter()
+        text = ""
+        committed = False  # set once the reply can no longer be the end-call sentinel
+
+        for chunk in self.gemini.model.generate_content(prompt, stream=True):
+            try:
+                delta = parser.feed(chunk.text)
+            except ValueError:
+                # Chunks without text (e.g. safety metadata) carry nothing to speak
+                continue
+            text += delta
+            if not committed and could_be_end_call(text):
+                continue
+            if not committed:
+                committed = True
+                delta = text
+            yield from splitter.feed(delta)
+
+        if not text:
+            # JSON reply without a "response" key: speak the raw reply instead
+            text = parser.fallback_text()
+        print("\n\nresponse: ", parser.raw, "\n\n")
+        if not committed:
+            if is_end_call(text):
+                yield END_CALL
+                return
+            yield from splitter.feed(text)
+        yield from splitter.flush()
+
+    def response_prompt(self, user_input, conversation_history, audio_check, context=None):
+        if context is None:
+            context = self.fetch_context(user_input)
         # history_str = "\n".join(conversation_history[-10:])  # Keep last 10 exchanges
-        history_str = "\n".join(filter(None, conversation_history[-10:])) # Filter out None values
+        # Up to the last 10 entries, fewer if they would overrun the history budget
+        history_str = "\n".join(self.context_builder.fit_history(conversation_history, self.history_tokens))
 
         if audio_check:
             audio_condition = "- If a question seems incomplete or does not make sense ( like a random phrase or cut off in the middle of a sentence), it might be an issue with the audio, ask the user to kindly repeat themselves. "
@@ -67,19 +139,7 @@ class RAGModel:
         {audio_condition}
         
         IMPORTANT: If the client mentions anything that indicates they are done with the call and want to end it, simply return "response": "end call", nothing else"""
-        
-        response = self.gemini.model.generate_content(prompt)
-
-        raw_text = response.text.strip()
-        
-        print("\n\nresponse: ", response.text, "\n\n")
-        # Parse the JSON and extract the "response" key
-        try:
-            data = json.loads(raw_text)
-            return data.get("response", "")
-        except json.JSONDecodeError:
-            # If the JSON fails to parse, return the raw text
-            return {"response": raw_text}
+        return prompt
 
 
     def _clean_json(self, text):
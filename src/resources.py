@@ -0,0 +1,115 @@
+# resources.py
+"""
+Process-wide shared instances of the expensive objects the app needs
+(embedding model, Chroma client, PyAudio, TTS engine, ElevenLabs client,
+Whisper model, NLTK data).
+
+Streamlit re-executes the UI script on every interaction, but imported
+modules live for the whole server process, so everything built here is
+created once on first use and then shared by every rerun and session.
+"""
+import threading
+import time
+
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+_warm_up_thread = None
+build_times = {}
+
+
+def shared(name, factory):
+    """Return the instance registered under `name`, building it with factory() on first use"""
+    if name in _instances:
+        return _instances[name]
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    # Per-resource lock: different resources can be built concurrently
+    with lock:
+        if name not in _instances:
+            started = time.perf_counter()
+            _instances[name] = factory()
+            build_times[name] = time.perf_counter() - started
+            print(f"Built shared resource '{name}' in {build_times[name]:.2f}s")
+    return _instances[name]
+
+
+def get_embedder(model_name="all-mpnet-base-v2"):
+    def build():
+        from src.embedder import TextEmbedder
+        return TextEmbedder(model_name)
+    return shared(f"embedder:{model_name}", build)
+
+
+def get_chroma_client():
+    def build():
+        import chromadb
+        return chromadb.PersistentClient()
+    return shared("chroma_client", build)
+
+
+def get_pyaudio():
+    def build():
+        import pyaudio
+        return pyaudio.PyAudio()
+    return shared("pyaudio", build)
+
+
+def get_elevenlabs_client(api_key, base_url=None):
+    def build():
+        from elevenlabs.client import ElevenLabs
+        if base_url:
+            return ElevenLabs(api_key=api_key, base_url=base_url)
+        return ElevenLabs(api_key=api_key)
+    # Keyed by hash so the key itself never shows up in the build log
+    return shared(f"elevenlabs:{hash((api_key, base_url))}", build)
+
+
+def get_whisper_model(model_size="base"):
+    def build():
+        import whisper
+        return whisper.load_model(model_size, device="cpu")
+    return shared(f"whisper:{model_size}", build)
+
+
+def ensure_nltk_data():
+    def build():
+        import nltk
+        for resource in ("punkt", "punkt_tab"):
+            try:
+                nltk.data.find(f"tokenizers/{resource}")
+            except LookupError:
+                print(f"Downloading NLTK {resource} data...")
+                nltk.download(resource)
+        return True
+    return shared("nltk_data", build)
+
+
+def warm_up(background=True, voice=False):
+    """
+    Build the resources needed for a first query ahead of time, plus the
+    audio devices when voice=True. Safe to call on every rerun: only the
+    first call starts the work.
+    """
+    global _warm_up_thread
+
+    getters = [ensure_nltk_data, get_chroma_client, get_embedder]
+    if voice:
+        getters += [get_pyaudio]
+
+    def run():
+        for getter in getters:
+            try:
+                getter()
+            except Exception as e:
+                print(f"Warm-up of {getter.__name__} failed: {e}")
+
+    with _registry_lock:
+        if _warm_up_thread is not None:
+            return _warm_up_thread
+        _warm_up_thread = threading.Thread(target=run, name="resource-warm-up", daemon=True)
+    if background:
+        _warm_up_thread.start()
+    else:
+        _warm_up_thread.run()
+    return _warm_up_thread
@@ -0,0 +1,123 @@
+# response_stream.py
+import json
+import re
+
+END_CALL = "end call"
+
+_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "inc.", "ltd.", "co."}
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+
+class ResponseStreamParser:
+    """
+    Incrementally extract the "response" string from a streamed reply of
+    the form {"response": "..."}, decoding JSON escapes as they arrive.
+    Replies that are not JSON are passed through as plain text.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self._pos = 0
+        self._mode = None       # None until decided, then "json" or "plain"
+        self._in_value = False
+        self._done = False
+
+    def feed(self, text):
+        """Add raw model output and return the newly decoded response text"""
+        self.raw += text
+        if self._mode is None:
+            stripped = self.raw.lstrip().lstrip("`").lstrip()
+            if stripped.startswith("json"):
+                stripped = stripped[4:].lstrip()
+            # Wait until we're past any ```json fence before deciding
+            if not stripped or "json".startswith(stripped):
+                return ""
+            self._mode = "json" if stripped[0] in '{"' else "plain"
+            if self._mode == "plain":
+                self._pos = len(self.raw) - len(self.raw.lstrip())
+        if self._mode == "plain":
+            out = self.raw[self._pos:]
+            self._pos = len(self.raw)
+            return out
+        return self._scan()
+
+    def _scan(self):
+        if self._done:
+            return ""
+        if not self._in_value:
+            match = re.search(r'"response"\s*:\s*"', self.raw[self._pos:])
+            if not match:
+                return ""
+            self._pos += match.end()
+            self._in_value = True
+
+        out = []
+        raw = self.raw
+        while self._pos < len(raw):
+            char = raw[self._pos]
+            if char == '"':
+                self._done = True
+                self._pos += 1
+                break
+            if char == "\\":
+                # Escape sequences may be split across chunks; wait for the rest
+                if self._pos + 1 >= len(raw):
+                    break
+                if raw[self._pos + 1] == "u":
+                    if self._pos + 6 > len(raw):
+                        break
+                    escape = raw[self._pos:self._pos + 6]
+                else:
+                    escape = raw[self._pos:self._pos + 2]
+                try:
+                    out.append(json.loads(f'"{escape}"'))
+                except json.JSONDecodeError:
+                    out.append(escape[1:])
+                self._pos += len(escape)
+                continue
+            out.append(char)
+            self._pos += 1
+        return "".join(out)
+
+    def fallback_text(self):
+        """Text to use when a JSON reply never contained a "response" key"""
+        if self._mode == "json" and not self._in_value:
+            return self.raw.strip()
+        return ""
+
+
+class SentenceSplitter:
+    """Buffer streamed text and release it one complete sentence at a time"""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            last_word = candidate.rsplit(None, 1)[-1].lower() if candidate else ""
+            if last_word in _ABBREVIATIONS:
+                continue
+            if candidate:
+                sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+
+def could_be_end_call(text):
+    """True while the response so far may still turn out to be the end-call sentinel"""
+    normalized = re.sub(r"[^a-z ]", "", text.lower()).strip()
+    return END_CALL.startswith(normalized)
+
+
+def is_end_call(text):
+    return re.sub(r"[^a-z ]", "", text.lower()).strip() == END_CALL
@@ -0,0 +1,68 @@
+# streaming_tts.py
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.tts import start_audio
+
+_DONE = object()
+
+
+class StreamingSpeaker:
+    """
+    Sentence-level streaming TTS.
+    speak() queues a sentence for synthesis right away; a playback thread
+    plays finished audio strictly in sentence order, so the first sentence
+    can be heard while later ones are still being generated or synthesized.
+    synthesize(text) may return bytes or a chunk stream; a stream is handed
+    to play() after its first chunk and keeps downloading while it plays.
+    """
+
+    def __init__(self, synthesize, play, synth_workers=2):
+        self.synthesize = synthesize
+        self.play = play
+        self.started = time.perf_counter()
+        self.first_audio_at = None
+        self.sentences = []
+        self._executor = ThreadPoolExecutor(max_workers=synth_workers)
+        self._audio = queue.Queue()
+        self._player = threading.Thread(target=self._play_loop, name="streaming-tts", daemon=True)
+        self._player.start()
+
+    def speak(self, sentence):
+        self.sentences.append(sentence)
+        self._audio.put(self._executor.submit(self._synthesize, sentence))
+
+    def _synthesize(self, sentence):
+        return start_audio(self.synthesize(sentence))
+
+    def finish(self):
+        """Wait until every queued sentence has been played"""
+        self._audio.put(_DONE)
+        self._player.join()
+        self._executor.shutdown(wait=False)
+
+    @property
+    def first_audio_latency(self):
+        """Seconds from creating the speaker to the start of the first playback"""
+        if self.first_audio_at is None:
+            return None
+        return self.first_audio_at - self.started
+
+    def _play_loop(self):
+        while True:
+            future = self._audio.get()
+            if future is _DONE:
+                return
+            try:
+                audio = future.result()
+            except Exception as e:
+                print(f"Failed to synthesize sentence: {e}")
+                continue
+            if self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            try:
+                self.play(audio)
+            except Exception as e:
+                print(f"Failed to play sentence: {e}")
@@ -0,0 +1,155 @@
+# stt.py
+"""
+Speech-to-text backends.
+
+Every backend takes one utterance of 16 kHz mono 16-bit PCM (bytes,
+memoryview or int16 array) and returns the transcript, or "" when nothing
+intelligible was said; service failures raise. Backends with
+supports_partials can also be run repeatedly over a growing utterance
+(see PartialTranscript) to produce transcripts while the caller is still
+speaking.
+"""
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def pcm_samples(pcm):
+    """View PCM as an int16 array without copying"""
+    if isinstance(pcm, np.ndarray):
+        return pcm
+    return np.frombuffer(pcm, dtype=np.int16)
+
+
+class STTStats:
+    """Decode time against audio time, i.e. the real-time factor"""
+
+    def __init__(self):
+        self.calls = 0
+        self.audio_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def record(self, audio_seconds, decode_seconds):
+        self.calls += 1
+        self.audio_seconds += audio_seconds
+        self.decode_seconds += decode_seconds
+
+    @property
+    def rtf(self):
+        return self.decode_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "audio_seconds": round(self.audio_seconds, 2),
+            "decode_seconds": round(self.decode_seconds, 2),
+            "rtf": round(self.rtf, 3)
+        }
+
+
+class GoogleSTT:
+    """Google Web Speech API through speech_recognition (one network round trip per utterance)"""
+
+    name = "google"
+    supports_partials = False
+
+    def __init__(self, recognizer=None):
+        import speech_recognition as sr
+        self.recognizer = recognizer or sr.Recognizer()
+        self.stats = STTStats()
+
+    def transcribe(self, pcm):
+        import speech_recognition as sr
+
+        samples = pcm_samples(pcm)
+        started = time.perf_counter()
+        try:
+            return self.recognizer.recognize_google(sr.AudioData(samples.tobytes(), SAMPLE_RATE, 2))
+        except sr.UnknownValueError:
+            return ""
+        finally:
+            self.stats.record(len(samples) / SAMPLE_RATE, time.perf_counter() - started)
+
+
+class WhisperSTT:
+    """
+    Local Whisper (openai-whisper) on the CPU. No network, and cheap enough
+    on short audio with the smaller models to re-decode a growing utterance.
+    """
+
+    name = "whisper"
+    supports_partials = True
+
+    def __init__(self, model_size="base", language="en"):
+        self.model_size = model_size
+        self.language = language
+        self.stats = STTStats()
+
+    @property
+    def model(self):
+        from src.resources import get_whisper_model
+        return get_whisper_model(self.model_size)
+
+    def transcribe(self, pcm):
+        samples = pcm_samples(pcm)
+        if not len(samples):
+            return ""
+        audio = samples.astype(np.float32) / 32768.0
+        started = time.perf_counter()
+        try:
+            result = self.model.transcribe(
+                audio,
+                language=self.language,
+                fp16=False,
+                temperature=0.0,
+                condition_on_previous_text=False
+            )
+        finally:
+            self.stats.record(len(samples) / SAMPLE_RATE, time.perf_counter() - started)
+        return result.get("text", "").strip()
+
+
+def make_stt(name="google", **kwargs):
+    """Build an STT backend by name ("google" or "whisper")"""
+    backends = {GoogleSTT.name: GoogleSTT, WhisperSTT.name: WhisperSTT}
+    if name not in backends:
+        raise ValueError(f"Unknown STT backend '{name}', expected one of {sorted(backends)}")
+    return backends[name](**kwargs)
+
+
+class PartialTranscript:
+    """
+    Transcript of an utterance that is still being spoken, built from
+    repeated decodes of the audio so far.
+
+    A word prefix that two consecutive decodes agree on is treated as
+    stable. `covers` is how many samples the latest decode saw; if that
+    reaches past the last voiced sample, the latest text is already the
+    final transcript and no decode is needed at end of speech.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.stable = ""
+        self.covers = 0
+        self.decodes = 0
+
+    def update(self, text, covers):
+        previous = self.text.split()
+        words = text.split()
+        agreed = 0
+        while agreed < min(len(previous), len(words)) and previous[agreed].lower() == words[agreed].lower():
+            agreed += 1
+        if agreed > len(self.stable.split()):
+            self.stable = " ".join(words[:agreed])
+        self.text = text
+        self.covers = covers
+        self.decodes += 1
+
+    def final_for(self, voiced_until):
+        """The latest text if it already covers all speech up to voiced_until, else None"""
+        if self.decodes and self.covers >= voiced_until:
+            return self.text
+        return None
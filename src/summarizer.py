@@ -0,0 +1,162 @@
+# summarizer.py
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.gemini_handler import is_quota_error
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting requests per minute"""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, rate_per_minute // 6)
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+
+
+class ConcurrentSummarizer:
+    """
+    Fan chunk summarization out over a thread pool.
+    Requests are throttled by a token bucket and quota errors are retried
+    with jittered exponential backoff. Results come back in chunk order.
+    """
+
+    def __init__(self, processor, max_workers=8, requests_per_minute=60,
+                 max_retries=5, base_delay=1.0, max_delay=30.0,
+                 max_chars_per_request=None, sleep=time.sleep):
+        self.processor = processor
+        # When set, chunks are packed into multi-chunk requests via process_chunks
+        self.max_chars_per_request = max_chars_per_request
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(requests_per_minute, sleep=sleep)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+
+    def _backoff(self, attempt):
+        # Full jitter: spread retries so workers don't hit the quota in lockstep
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def _with_retries(self, call, default=None):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return call()
+            except Exception as e:
+                if not is_quota_error(e) or attempt == self.max_retries:
+                    print(f"Summarization failed: {e}")
+                    return default
+                delay = self._backoff(attempt)
+                print(f"Quota error, retrying in {delay:.1f}s (attempt {attempt + 1})")
+                self._sleep(delay)
+
+    def summarize_chunk(self, chunk):
+        """Summarize a single chunk with caching, rate limiting and retries"""
+        cached = getattr(self.processor, "cached", None)
+        hit = cached(chunk) if cached else None
+        if hit is not None:
+            return hit
+        return self._summarize_group([chunk], [0])[0]
+
+    def summarize_batch(self, chunks):
+        """
+        Summarize a handful of chunks on the calling thread: cache hits
+        first, the rest packed into multi-chunk requests when
+        max_chars_per_request is set. Returns results in chunk order.
+        """
+        results = [None] * len(chunks)
+        pending = []
+        cached = getattr(self.processor, "cached", None)
+        for i, chunk in enumerate(chunks):
+            hit = cached(chunk) if cached else None
+            if hit is None:
+                pending.append(i)
+            else:
+                results[i] = hit
+
+        if self.max_chars_per_request:
+            groups = self.processor.pack_chunks([chunks[i] for i in pending], self.max_chars_per_request)
+            groups = [[pending[j] for j in group] for group in groups]
+        else:
+            groups = [[i] for i in pending]
+        for group in groups:
+            for i, result in zip(group, self._summarize_group(chunks, group)):
+                results[i] = result
+        return results
+
+    def summarize(self, chunks, on_result=None):
+        """
+        Summarize all chunks concurrently.
+        on_result(index, result) is called from the calling thread as each
+        chunk finishes, so callers can write results out immediately.
+        Returns the list of results in chunk order (None for failures).
+        """
+        chunks = list(chunks)
+        results = [None] * len(chunks)
+        if not chunks:
+            return results
+
+        # Cache hits cost no API call, so resolve them without touching the rate limiter
+        pending = []
+        cached = getattr(self.processor, "cached", None)
+        for i, chunk in enumerate(chunks):
+            hit = cached(chunk) if cached else None
+            if hit is None:
+                pending.append(i)
+                continue
+            results[i] = hit
+            if on_result:
+                on_result(i, hit)
+
+        if self.max_chars_per_request:
+            groups = self.processor.pack_chunks([chunks[i] for i in pending], self.max_chars_per_request)
+            groups = [[pending[j] for j in group] for group in groups]
+        else:
+            groups = [[i] for i in pending]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._summarize_group, chunks, group): group for group in groups}
+            for future in as_completed(futures):
+                group = futures[future]
+                for i, result in zip(group, future.result()):
+                    results[i] = result
+                    if on_result:
+                        on_result(i, result)
+        return results
+
+    def _summarize_group(self, chunks, group):
+        if len(group) == 1:
+            chunk = chunks[group[0]]
+            return [self._with_retries(
+                lambda: self.processor.process_chunk(chunk, raise_on_quota=True, check_cache=False)
+            )]
+        texts = [chunks[i] for i in group]
+        return self._with_retries(
+            lambda: self.processor.process_chunks(texts, max_chars_per_request=self.max_chars_per_request,
+                                                  raise_on_quota=True, check_cache=False),
+            default=[None] * len(group)
+        )
@@ -0,0 +1,29 @@
+# summary_cache.py
+import json
+import zlib
+
+from src.blob_cache import BlobCache, content_key
+
+
+class SummaryCache(BlobCache):
+    """
+    Persistent, content-addressed cache of chunk summaries.
+    Entries are keyed by a hash of (prompt version, model name, chunk text),
+    stored as zlib-compressed JSON in SQLite and evicted least-recently-used
+    once the stored size exceeds max_bytes.
+    """
+
+    table = "summaries"
+
+    def __init__(self, path="cache/summaries.db", max_bytes=64 * 1024 * 1024):
+        super().__init__(path, max_bytes)
+
+    @staticmethod
+    def make_key(text, prompt_version, model_name):
+        return content_key(prompt_version, model_name, text)
+
+    def encode(self, value):
+        return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+    def decode(self, blob):
+        return json.loads(zlib.decompress(blob))
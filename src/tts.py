@@ -0,0 +1,434 @@
+# tts.py
+"""
+Text-to-speech backends.
+
+Every backend turns one piece of text into audio bytes (MP3, or WAV for
+the local engine) that ffplay-based players such as src/playback.py can
+play straight from memory. stream(text) yields the audio in chunks as the
+provider sends it, and the player writes each chunk to ffplay as it
+arrives, so speech starts before the clip has finished downloading;
+synthesize(text) returns it whole (for caching or pre-synthesized audio).
+
+PrefetchedAudio pulls a stream on its own thread, so a sentence can be
+synthesized while an earlier one is still playing.
+
+RacingTTS puts a ceiling on tail latency: when a remote backend has not
+produced its first audio within a deadline, the sentence is synthesized
+locally instead.
+"""
+import abc
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from collections import deque
+
+
+# MPEG audio frame header tables, indexed by the header's version/layer/rate fields
+_MP3_BITRATES = {  # kbps by (MPEG-1?, layer)
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_seconds(audio):
+    """Playing time of MP3 bytes from their frame headers (CBR or VBR), or None if there are none"""
+    offset = 0
+    if audio[:3] == b"ID3" and len(audio) >= 10:
+        size = (audio[6] << 21) | (audio[7] << 14) | (audio[8] << 7) | audio[9]
+        offset = 10 + size + (10 if audio[5] & 0x10 else 0)
+    seconds = 0.0
+    frames = 0
+    end = len(audio) - 4
+    while offset <= end:
+        b1, b2 = audio[offset + 1], audio[offset + 2]
+        version, layer = (b1 >> 3) & 3, 4 - ((b1 >> 1) & 3)
+        rate_index, bitrate_index = (b2 >> 2) & 3, b2 >> 4
+        if (audio[offset] != 0xFF or b1 & 0xE0 != 0xE0 or version == 1 or layer == 4
+                or rate_index == 3 or bitrate_index in (0, 15)):
+            offset += 1  # not a frame header: resync
+            continue
+        mpeg1 = version == 3
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+        bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+        samples = 384 if layer == 1 else 1152 if layer == 2 or mpeg1 else 576
+        padding = (b2 >> 1) & 1
+        length = (12 * bitrate // sample_rate + padding) * 4 if layer == 1 else \
+            samples // 8 * bitrate // sample_rate + padding
+        seconds += samples / sample_rate
+        frames += 1
+        offset += length
+    return seconds if frames else None
+
+
+def playing_seconds(audio):
+    """
+    Playing time of WAV or MP3 bytes, read from the WAV header or the MP3
+    frame headers, so it is right for any bitrate (ElevenLabs' 128 kbps,
+    gTTS' 32 kbps, VBR). None when the length can't be determined.
+    """
+    if audio[:4] == b"RIFF" and len(audio) >= 44:
+        byte_rate = struct.unpack("<I", audio[28:32])[0]
+        return (len(audio) - 44) / byte_rate if byte_rate else None
+    return _mp3_seconds(audio)
+
+
+class TTSStats:
+    """Time to first audio and to the whole clip, per backend"""
+
+    def __init__(self, window=200):
+        self.calls = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.first_audio = deque(maxlen=window)
+
+    def record(self, first_audio_seconds, total_seconds):
+        self.calls += 1
+        self.total_seconds += total_seconds
+        self.first_audio.append(first_audio_seconds)
+
+    def as_dict(self):
+        latencies = sorted(self.first_audio)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "first_audio_mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "first_audio_p95": round(latencies[round(0.95 * (len(latencies) - 1))], 3) if latencies else 0.0,
+            "first_audio_max": round(latencies[-1], 3) if latencies else 0.0,
+            "total_mean": round(self.total_seconds / self.calls, 3) if self.calls else 0.0
+        }
+
+
+class TTSBackend(abc.ABC):
+    """
+    Shared timing and caching around a backend's _chunks(text). With a
+    TTSCache, text synthesized before with the same settings is returned
+    from disk without calling the backend.
+    """
+
+    name = None
+    remote = True
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.stats = TTSStats()
+
+    @abc.abstractmethod
+    def cache_key(self, text):
+        """Cache key for text under this backend's voice and format settings"""
+
+    @abc.abstractmethod
+    def _chunks(self, text):
+        """Yield the audio for text in the pieces the provider sends"""
+
+    def stream(self, text):
+        key = None
+        if self.cache is not None:
+            key = self.cache_key(text)
+            audio = self.cache.get(key)
+            if audio is not None:
+                yield audio
+                return
+
+        started = time.perf_counter()
+        first = None
+        chunks = []
+        try:
+            for chunk in self._chunks(text):
+                if not chunk:
+                    continue
+                if first is None:
+                    first = time.perf_counter() - started
+                chunks.append(chunk)
+                yield chunk
+        except Exception:
+            self.stats.failures += 1
+            raise
+        total = time.perf_counter() - started
+        self.stats.record(total if first is None else first, total)
+
+        if key is not None and chunks:
+            self.cache.put(key, b"".join(chunks))
+
+    def synthesize(self, text):
+        """Return the audio for text as bytes"""
+        return b"".join(self.stream(text))
+
+    def report(self):
+        report = {"backend": self.name, **self.stats.as_dict()}
+        if self.cache is not None:
+            report["cache"] = self.cache.stats()
+        return report
+
+
+class ElevenLabsTTS(TTSBackend):
+    """
+    ElevenLabs text-to-speech through one long-lived client, so every
+    utterance reuses the client's pooled HTTPS connection instead of
+    opening a new one.
+    """
+
+    name = "elevenlabs"
+
+    def __init__(self, api_key=None, voice_id="cgSgspJ2msm6clMCkdW9", model_id="eleven_multilingual_v2",
+                 output_format="mp3_44100_128", base_url=None, cache=None):
+        super().__init__(cache)
+        self.api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
+        # ELEVENLABS_BASE_URL points the client at a proxy or a local stub
+        self.base_url = base_url or os.getenv("ELEVENLABS_BASE_URL")
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.output_format = output_format
+
+    @property
+    def client(self):
+        from src.resources import get_elevenlabs_client
+        return get_elevenlabs_client(self.api_key, self.base_url)
+
+    def cache_key(self, text):
+        return self.cache.make_key(text, self.voice_id, self.model_id, self.output_format)
+
+    def _chunks(self, text):
+        return self.client.text_to_speech.convert(
+            text=text,
+            voice_id=self.voice_id,
+            model_id=self.model_id,
+            output_format=self.output_format,
+        )
+
+
+class GoogleTTS(TTSBackend):
+    """gTTS (Google Translate's speech endpoint), written to memory instead of a file"""
+
+    name = "gtts"
+
+    def __init__(self, lang="en", cache=None):
+        super().__init__(cache)
+        self.lang = lang
+
+    def cache_key(self, text):
+        return self.cache.make_key(text, self.name, self.lang, "mp3")
+
+    def _chunks(self, text):
+        from gtts import gTTS
+
+        # gTTS fetches the audio in pieces of up to 100 characters; yield each as it arrives
+        for decoded in gTTS(text=text, lang=self.lang, slow=False).stream():
+            yield decoded
+
+
+class LocalTTS(TTSBackend):
+    """
+    Offline speech from espeak-ng (the engine pyttsx3 drives on Linux),
+    rendered to WAV on its stdout. Robotic, but never waits on the network.
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(self, voice="en", rate=170, command=None, cache=None):
+        super().__init__(cache)
+        self.voice = voice
+        self.rate = rate
+        self.command = command or shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def cache_key(self, text):
+        return self.cache.make_key(text, self.name, self.voice, f"wav:{self.rate}")
+
+    def _chunks(self, text):
+        if self.command is None:
+            raise RuntimeError("Local TTS needs espeak-ng or espeak on the PATH")
+        result = subprocess.run([self.command, "--stdout", "-v", self.voice, "-s", str(self.rate), text],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+        yield result.stdout
+
+
+_END = object()
+
+
+class PrefetchedAudio:
+    """
+    A TTS chunk stream pulled on a background thread. Iterating it yields
+    the chunks as they arrive (for the player); `audio` is the whole clip
+    once `done` is set. Raises the synthesis error at the point it occurred.
+    """
+
+    def __init__(self, chunks):
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.error = None
+        self._parts = []
+        self._queue = queue.Queue()
+        threading.Thread(target=self._pull, args=(chunks,), name="tts-prefetch", daemon=True).start()
+
+    def _pull(self, chunks):
+        try:
+            for chunk in chunks:
+                if chunk:
+                    self._parts.append(chunk)
+                    self._queue.put(chunk)
+                    self.started.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+            self.started.set()
+            self._queue.put(_END)
+
+    def wait_first(self):
+        """Block until the first chunk arrived; raises if synthesis failed before producing any"""
+        self.started.wait()
+        if not self._parts and self.error is not None:
+            raise self.error
+        return self
+
+    @property
+    def audio(self):
+        return b"".join(self._parts)
+
+    def __iter__(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is _END:
+                self._queue.put(_END)
+                break
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+
+def start_audio(audio):
+    """
+    Start pulling synthesized audio: bytes are returned as they are, a chunk
+    stream comes back as a PrefetchedAudio once its first chunk is in.
+    """
+    if isinstance(audio, (bytes, bytearray)):
+        return audio
+    return PrefetchedAudio(audio).wait_first()
+
+
+class RacingTTS:
+    """
+    Remote TTS with a local fallback. If `primary` has not produced its
+    first audio within `deadline` seconds, has not finished the clip within
+    `total_deadline` seconds (default 3 x deadline), or fails, the text is
+    synthesized by `fallback` instead. A primary that was overtaken keeps
+    running in the background, so with a cache its audio is ready next time.
+
+    stream() can only fall back before the first chunk has been handed out:
+    a primary that stalls or fails after that ends the clip early.
+    """
+
+    def __init__(self, primary, fallback, deadline=1.0, total_deadline=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.deadline = deadline
+        # A remote that starts in time and then trickles is cut off here
+        self.total_deadline = deadline * 3 if total_deadline is None else max(deadline, total_deadline)
+        self.name = f"{primary.name}+{fallback.name}"
+        self.primary_wins = 0
+        self.fallbacks = 0
+
+    def synthesize(self, text):
+        first_audio = threading.Event()
+        result = {}
+
+        def run():
+            chunks = []
+            try:
+                for chunk in self.primary.stream(text):
+                    chunks.append(chunk)
+                    first_audio.set()
+                result["audio"] = b"".join(chunks)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                first_audio.set()
+
+        started = time.perf_counter()
+        worker = threading.Thread(target=run, name="tts-primary", daemon=True)
+        worker.start()
+        if first_audio.wait(self.deadline) and "error" not in result:
+            # The primary is streaming in time; give it until the total deadline to finish
+            worker.join(max(0.0, self.total_deadline - (time.perf_counter() - started)))
+            if "audio" in result:
+                self.primary_wins += 1
+                return result["audio"]
+            reason = result.get("error", f"audio not complete after {self.total_deadline:.2f}s")
+        else:
+            reason = result.get("error", f"no audio after {self.deadline:.2f}s")
+        print(f"{self.primary.name} TTS fell back to {self.fallback.name}: {reason}")
+        self.fallbacks += 1
+        return self.fallback.synthesize(text)
+
+    def stream(self, text):
+        chunks = queue.Queue()
+
+        def run():
+            try:
+                for chunk in self.primary.stream(text):
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_END)
+
+        started = time.perf_counter()
+        threading.Thread(target=run, name="tts-primary", daemon=True).start()
+        try:
+            first = chunks.get(timeout=self.deadline)
+        except queue.Empty:
+            first = TimeoutError(f"no audio after {self.deadline:.2f}s")
+        if isinstance(first, bytes):
+            self.primary_wins += 1
+            yield first
+            while True:
+                try:
+                    chunk = chunks.get(timeout=max(0.0, self.total_deadline - (time.perf_counter() - started)))
+                except queue.Empty:
+                    chunk = TimeoutError(f"audio not complete after {self.total_deadline:.2f}s")
+                if chunk is _END:
+                    return
+                if isinstance(chunk, Exception):
+                    print(f"{self.primary.name} TTS cut short: {chunk}")
+                    return
+                yield chunk
+        reason = "no audio" if first is _END else first
+        print(f"{self.primary.name} TTS fell back to {self.fallback.name}: {reason}")
+        self.fallbacks += 1
+        yield from self.fallback.stream(text)
+
+    def report(self):
+        return {
+            "backend": self.name,
+            "deadline": self.deadline,
+            "total_deadline": self.total_deadline,
+            "primary_wins": self.primary_wins,
+            "fallbacks": self.fallbacks,
+            "primary": self.primary.report(),
+            "fallback": self.fallback.report()
+        }
+
+
+def make_tts(name="elevenlabs", cache=None, race_deadline=None, **kwargs):
+    """
+    Build a TTS backend by name ("elevenlabs", "gtts" or "local"). With
+    race_deadline, a remote backend is wrapped in a RacingTTS that falls
+    back to LocalTTS after that many seconds without audio (or three times
+    that without the complete clip).
+    """
+    backends = {ElevenLabsTTS.name: ElevenLabsTTS, GoogleTTS.name: GoogleTTS, LocalTTS.name: LocalTTS}
+    if name not in backends:
+        raise ValueError(f"Unknown TTS backend '{name}', expected one of {sorted(backends)}")
+    backend = backends[name](cache=cache, **kwargs)
+    if race_deadline is not None and backend.remote:
+        return RacingTTS(backend, LocalTTS(), deadline=race_deadline)
+    return backend
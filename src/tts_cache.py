@@ -0,0 +1,21 @@
+# tts_cache.py
+from src.blob_cache import BlobCache, content_key
+
+
+class TTSCache(BlobCache):
+    """
+    Persistent cache of synthesized speech.
+    Entries are keyed by a hash of (text, voice id, model id, output format)
+    and stored as raw audio bytes in SQLite, evicted least-recently-used once
+    the stored size exceeds max_bytes. Phrases the agent says on every call
+    (the goodbye, the opening, clarification prompts) then play from disk.
+    """
+
+    table = "audio"
+
+    def __init__(self, path="cache/tts.db", max_bytes=128 * 1024 * 1024):
+        super().__init__(path, max_bytes)
+
+    @staticmethod
+    def make_key(text, voice_id, model_id, output_format):
+        return content_key(voice_id, model_id, output_format, text)
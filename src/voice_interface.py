@@ -1,14 +1,100 @@
 # voice_interface.py
 
 import os
-import speech_recognition as sr
-import tempfile
+import threading
 import time
-import pygame
-from gtts import gTTS
+from contextlib import contextmanager
+
+# Audio/speech libraries are imported where they are first used so that
+# importing this module (or the UI) stays cheap for text-only sessions.
+
+class MicrophoneSession:
+    """
+    A microphone that stays open for the life of a VoiceInterface.
+
+    It is calibrated once; after that a background thread reads the stream
+    whenever nobody is listening and keeps the recognizer's energy threshold
+    following the room noise. The noise level is the quietest chunk of the
+    last few seconds (speech has gaps, background noise does not), so the
+    threshold follows the room up as well as down. During a listen, speech_recognition's own dynamic threshold
+    keeps adjusting, so every listen can start at once with an accurate
+    threshold instead of spending a second in adjust_for_ambient_noise.
+    """
+
+    def __init__(self, recognizer, microphone, calibration_seconds=1, margin=1.2, window_seconds=3):
+        from collections import deque
+        from src.audio_buffer import rms
+
+        self._rms = rms
+        self.recognizer = recognizer
+        self.microphone = microphone
+        self.recognizer.dynamic_energy_threshold = True
+        self.source = microphone.__enter__()
+        self.seconds_per_buffer = self.source.CHUNK / self.source.SAMPLE_RATE
+        self._recent = deque(maxlen=max(1, int(window_seconds / self.seconds_per_buffer)))
+
+        print("Calibrating microphone...")
+        self.recognizer.adjust_for_ambient_noise(self.source, duration=calibration_seconds)
+        self.recognizer.energy_threshold *= margin
+        print(f"Energy threshold set to: {self.recognizer.energy_threshold}")
+
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = threading.Event()
+        self._tracker = threading.Thread(target=self._track, name="mic-noise-tracker", daemon=True)
+        self._tracker.start()
+
+    @property
+    def energy_threshold(self):
+        return self.recognizer.energy_threshold
+
+    @contextmanager
+    def listening(self):
+        """Exclusive use of the open source for one listen"""
+        self._idle.clear()
+        try:
+            with self._lock:
+                yield self.source
+        finally:
+            self._idle.set()
+
+    def close(self):
+        self._closed.set()
+        self._idle.set()
+        self._tracker.join()
+        self.microphone.__exit__(None, None, None)
+
+    def _track(self):
+        while not self._closed.is_set():
+            self._idle.wait()
+            with self._lock:
+                if self._closed.is_set() or not self._idle.is_set():
+                    continue
+                try:
+                    buffer = self.source.stream.read(self.source.CHUNK)
+                except Exception as e:
+                    print(f"Error reading microphone for noise tracking: {e}")
+                    time.sleep(self.seconds_per_buffer)
+                    continue
+            self.observe(self._rms(buffer))
+
+    def observe(self, energy):
+        """Move the threshold toward the current noise level, given one chunk's energy"""
+        recognizer = self.recognizer
+        self._recent.append(energy)
+        noise = min(self._recent)
+        # Same weighted average speech_recognition uses while listening
+        damping = recognizer.dynamic_energy_adjustment_damping ** self.seconds_per_buffer
+        target = noise * recognizer.dynamic_energy_ratio
+        recognizer.energy_threshold = recognizer.energy_threshold * damping + target * (1 - damping)
+
 
 class VoiceInterface:
-    def __init__(self, output_dir="generated_audio"):
+    def __init__(self, output_dir="generated_audio", stt=None):
+        import speech_recognition as sr
+        import pygame
+
         # Create output directory if it doesn't exist
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
@@ -21,37 +107,41 @@ class VoiceInterface:
         pygame.init()
         pygame.mixer.init()
         
-        # For adaptive listening
-        self.energy_threshold = 300  # Default energy threshold
-        
-        # Initialize first with ambient noise adjustment
-        with self.microphone as source:
-            print("Calibrating microphone...")
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-            self.energy_threshold = self.recognizer.energy_threshold * 1.2
-            print(f"Energy threshold set to: {self.energy_threshold}")
-
-    def text_to_speech_and_play(self, text, lang='en'):
-        """Convert text to speech and play it immediately"""
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-            temp_filename = temp_file.name
-        
-        # Generate speech
-        tts = gTTS(text=text, lang=lang, slow=False)
-        tts.save(temp_filename)
-        
-        # Play the audio
-        pygame.mixer.music.load(temp_filename)
+        # Speech-to-text backend (src/stt.py); Google's web API unless another is given
+        from src.stt import GoogleSTT
+        self.stt = stt or GoogleSTT(self.recognizer)
+
+        # Calibrate once, then keep tracking the noise floor in the background
+        self.session = MicrophoneSession(self.recognizer, self.microphone)
+
+    @property
+    def energy_threshold(self):
+        return self.session.energy_threshold
+
+    def close(self):
+        """Release the microphone"""
+        self.session.close()
+
+    def text_to_speech_and_play(self, text, lang='en', stop_event=None):
+        """Convert text to speech and play it immediately; setting stop_event stops playback"""
+        import io
+        import pygame
+        from src.tts import GoogleTTS
+
+        # Synthesized and played from memory, without a temporary file
+        audio = GoogleTTS(lang=lang).synthesize(text)
+        pygame.mixer.music.load(io.BytesIO(audio))
         pygame.mixer.music.play()
         
-        # Wait for playback to finish
+        # Wait for playback to finish, or for stop_event (barge-in) to cut it off
+        clock = pygame.time.Clock()
         while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
+            if stop_event is not None and stop_event.is_set():
+                pygame.mixer.music.stop()
+                break
+            clock.tick(33)  # ~30 ms, one VAD frame
         
-        # Clean up
         pygame.mixer.music.unload()
-        os.unlink(temp_filename)
     
     def listen_from_mic_adaptive(self, min_silence_duration=4):
         """
@@ -61,6 +151,8 @@ class VoiceInterface:
         This version uses a single microphone context to prevent the 
         "already inside a context manager" error.
         """
+        import speech_recognition as sr
+
         all_text = []
         speech_detected = False
         last_speech_time = 0
@@ -69,12 +161,8 @@ class VoiceInterface:
         
         print("Listening...")
         
-        # Use a single microphone context
-        with self.microphone as source:
-            # Initial ambient noise adjustment
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-            self.recognizer.energy_threshold = self.energy_threshold
-            
+        # The session's microphone is already open and calibrated
+        with self.session.listening() as source:
             # Main listening loop
             while True:
                 try:
@@ -84,7 +172,7 @@ class VoiceInterface:
                     audio = self.recognizer.listen(source, timeout=3.0, phrase_time_limit=10.0)
                     
                     # Try to recognize the speech
-                    text = self.recognizer.recognize_google(audio)
+                    text = self._recognize(audio)
                     if text:
                         print(f"Recognized: {text}")
                         all_text.append(text)
@@ -138,14 +226,13 @@ class VoiceInterface:
 
     def listen_from_mic(self, timeout=5):
         """Legacy method - Listen to microphone input and return transcribed text"""
-        with self.microphone as source:
-            print("Adjusting for ambient noise...")
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-            
+        import speech_recognition as sr
+
+        with self.session.listening() as source:
             try:
                 print("Listening...")
                 audio = self.recognizer.listen(source, timeout=timeout)
-                return self.recognizer.recognize_google(audio)
+                return self._recognize(audio)
             except sr.WaitTimeoutError:
                 return ""
             except sr.UnknownValueError:
@@ -155,6 +242,16 @@ class VoiceInterface:
                 print(f"Recognition error: {e}")
                 return ""
 
+    def _recognize(self, audio):
+        """Transcribe an sr.AudioData with the STT backend; raises sr.UnknownValueError like recognize_google"""
+        import speech_recognition as sr
+        from src.stt import SAMPLE_RATE
+
+        text = self.stt.transcribe(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2))
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
     def clear_audio_files(self):
         """Remove all generated audio files"""
         for filename in os.listdir(self.output_dir):
@@ -169,18 +266,20 @@ class VoiceInterface:
 # voice_interface.py
 
 import os
-import pyaudio
 import wave
-import struct
-import webrtcvad
 import time
-from collections import deque
+from src.resources import get_pyaudio
 
 
 class ImprovedVoiceInterface:
-    def __init__(self):
+    def __init__(self, debug_audio_dir=None, stt=None):
+        import pyaudio
+        import speech_recognition as sr
+        import webrtcvad
+
         # Audio parameters
         self.FORMAT = pyaudio.paInt16
+        self.SAMPLE_WIDTH = pyaudio.get_sample_size(self.FORMAT)
         self.CHANNELS = 1
         self.RATE = 16000  # Sample rate required by webrtcvad
         self.CHUNK_DURATION_MS = 30  # Duration of each chunk in milliseconds
@@ -190,108 +289,100 @@ class ImprovedVoiceInterface:
         
         # Initialize VAD
         self.vad = webrtcvad.Vad(3)  # Aggressiveness level 3 (0-3)
+
+        # Background level, tracked from non-speech chunks by the utterance detectors
+        from src.audio_buffer import NoiseFloor
+        self.noise_floor = NoiseFloor()
         
         # Initialize PyAudio
-        self.audio = pyaudio.PyAudio()
-        
-        # Create a directory for temporary audio files if it doesn't exist
-        os.makedirs("temp_audio", exist_ok=True)
+        self.audio = get_pyaudio()
+
+        # One recognizer for every turn
+        self.recognizer = sr.Recognizer()
+
+        # Speech-to-text backend (src/stt.py); Google's web API unless another is given
+        from src.stt import GoogleSTT
+        self.stt = stt or GoogleSTT(self.recognizer)
+
+        # Utterances are transcribed from memory; set a directory to also keep them as WAV files
+        self.debug_audio_dir = debug_audio_dir
+        if self.debug_audio_dir:
+            os.makedirs(self.debug_audio_dir, exist_ok=True)
         
     def clear_audio_files(self):
-        """Clear temporary audio files"""
-        for file in os.listdir("temp_audio"):
+        """Clear saved debug recordings"""
+        if not self.debug_audio_dir or not os.path.isdir(self.debug_audio_dir):
+            return
+        for file in os.listdir(self.debug_audio_dir):
             if file.endswith(".wav"):
-                os.remove(os.path.join("temp_audio", file))
+                os.remove(os.path.join(self.debug_audio_dir, file))
     
     def calculate_energy(self, data):
-        """Calculate audio energy using struct instead of audioop"""
-        # Convert bytes to short integers
-        shorts = struct.unpack(f"{len(data)//2}h", data)
-        
-        # Calculate RMS energy
-        sum_squares = sum(s*s for s in shorts)
-        return int((sum_squares / len(shorts)) ** 0.5) if shorts else 0
+        """RMS energy of a chunk of int16 PCM"""
+        from src.audio_buffer import rms
+        return int(rms(data))
+
+    def speech_threshold(self):
+        """Energy above which a chunk counts as speech when VAD is unavailable"""
+        if self.noise_floor.level is None:
+            return self.SILENCE_THRESHOLD
+        return max(self.SILENCE_THRESHOLD, 3 * self.noise_floor.level)
     
-    def listen_from_mic_with_vad(self):
-        """Listen from microphone with Voice Activity Detection"""
-        print("Listening...")
-        
-        # Open stream
-        stream = self.audio.open(
+    def is_speech_frame(self, data):
+        """VAD decision for one chunk, falling back to energy when webrtcvad fails"""
+        try:
+            return self.vad.is_speech(data, self.RATE)
+        except Exception as e:
+            # If VAD fails, fall back to energy-based detection
+            return self.calculate_energy(data) > self.speech_threshold()
+
+    def utterance_detector(self):
+        return UtteranceDetector(
+            self.is_speech_frame,
+            silence_chunks=int(self.SILENCE_DURATION * 1000 / self.CHUNK_DURATION_MS),
+            chunk_samples=self.CHUNK_SIZE,
+            noise_floor=self.noise_floor
+        )
+
+    def echo_gate(self):
+        return EchoGate(self.is_speech_frame, self.calculate_energy, floor=self.SILENCE_THRESHOLD,
+                        noise_floor=self.noise_floor)
+
+    def open_input_stream(self):
+        return self.audio.open(
             format=self.FORMAT,
             channels=self.CHANNELS,
             rate=self.RATE,
             input=True,
             frames_per_buffer=self.CHUNK_SIZE
         )
+
+    def read_frame(self, stream):
+        return stream.read(self.CHUNK_SIZE, exception_on_overflow=False)
+
+    def listen_from_mic_with_vad(self):
+        """Listen from microphone with Voice Activity Detection"""
+        print("Listening...")
         
-        # Variables for VAD
-        frames = []
-        is_speech = False
-        silent_chunks = 0
-        silent_chunks_threshold = int(self.SILENCE_DURATION * 1000 / self.CHUNK_DURATION_MS)
-        
-        # Buffer for storing audio context before speech detection
-        pre_speech_buffer = deque(maxlen=10)  # Store ~300ms of audio before speech starts
+        # Open stream
+        stream = self.open_input_stream()
+        detector = self.utterance_detector()
         
         try:
             # Main listening loop
-            while True:
-                data = stream.read(self.CHUNK_SIZE, exception_on_overflow=False)
-                pre_speech_buffer.append(data)
-                
-                # Check if this chunk contains speech
-                try:
-                    is_current_chunk_speech = self.vad.is_speech(data, self.RATE)
-                except Exception as e:
-                    # If VAD fails, fall back to energy-based detection
-                    energy = self.calculate_energy(data)
-                    is_current_chunk_speech = energy > self.SILENCE_THRESHOLD
-                
-                # State machine for speech detection
-                if not is_speech and is_current_chunk_speech:
-                    # Speech just started
-                    is_speech = True
-                    silent_chunks = 0
-                    # Include the pre-speech buffer to capture the beginning of speech
-                    frames.extend(list(pre_speech_buffer))
-                    print("Speech detected, recording...")
-                    
-                elif is_speech:
-                    # Continue recording
-                    frames.append(data)
-                    
-                    # Check for silence
-                    if not is_current_chunk_speech:
-                        silent_chunks += 1
-                        if silent_chunks >= silent_chunks_threshold:
-                            # Enough silence has passed, end recording
-                            print("Speech ended")
-                            break
-                    else:
-                        # Reset silence counter
-                        silent_chunks = 0
-                
-                # If we've been recording for too long, stop
-                if is_speech and len(frames) > 1000:  # ~30 seconds
-                    print("Maximum recording time reached")
-                    break
+            audio = None
+            while audio is None:
+                audio = detector.feed(self.read_frame(stream))
                     
             # Close stream
             stream.stop_stream()
             stream.close()
             
             # If we didn't record any speech, return None
-            if len(frames) == 0 or not is_speech:
+            if not audio:
                 return None
             
-            # Save audio to file
-            audio_file = os.path.join("temp_audio", f"recording_{int(time.time())}.wav")
-            self._save_audio(frames, audio_file)
-            
-            # Transcribe audio
-            transcription = self._transcribe_audio(audio_file)
-            return transcription
+            return self.transcribe(audio)
             
         except Exception as e:
             print(f"Error in voice recording: {e}")
@@ -299,42 +390,202 @@ class ImprovedVoiceInterface:
                 stream.stop_stream()
                 stream.close()
             return None
+
+    def transcribe(self, pcm):
+        """Transcribe one utterance of raw 16-bit mono PCM (bytes or memoryview), without touching the disk"""
+        if self.debug_audio_dir:
+            self._save_audio(pcm, os.path.join(self.debug_audio_dir, f"recording_{int(time.time() * 1000)}.wav"))
+        return self._recognize(pcm)
     
-    def _save_audio(self, frames, file_path):
-        """Save audio frames to a WAV file"""
+    def _save_audio(self, pcm, file_path):
+        """Save raw PCM to a WAV file"""
         wf = wave.open(file_path, 'wb')
         wf.setnchannels(self.CHANNELS)
-        wf.setsampwidth(self.audio.get_sample_size(self.FORMAT))
+        wf.setsampwidth(self.SAMPLE_WIDTH)
         wf.setframerate(self.RATE)
-        wf.writeframes(b''.join(frames))
+        wf.writeframes(pcm)
         wf.close()
     
     def _transcribe_audio(self, audio_file):
-        """Transcribe audio file using an API or local model"""
+        """Transcribe a WAV file saved by _save_audio"""
         try:
-            # Use SpeechRecognition library with Google's API
-            import speech_recognition as sr
-            recognizer = sr.Recognizer()
-            
-            with sr.AudioFile(audio_file) as source:
-                audio_data = recognizer.record(source)
-                
-                try:
-                    result = recognizer.recognize_google(audio_data)
-                    print(f"Google Speech Recognition result: {result}")
-                    return result
-                except sr.UnknownValueError:
-                    print("Google Speech Recognition could not understand audio")
-                    return "I couldn't understand that."
-                except sr.RequestError as e:
-                    print(f"Could not request results from Google Speech Recognition service; {e}")
-                    return "Sorry, my speech recognition service is currently unavailable."
-                    
+            with wave.open(audio_file, 'rb') as wf:
+                pcm = wf.readframes(wf.getnframes())
+            return self._recognize(pcm)
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            return "I couldn't understand that."
+
+    def _recognize(self, pcm):
+        """Run the STT backend on one utterance, turning failures into something to say back"""
+        import speech_recognition as sr
+
+        try:
+            result = self.stt.transcribe(pcm)
+        except sr.RequestError as e:
+            print(f"Could not request results from {self.stt.name} speech recognition service; {e}")
+            return "Sorry, my speech recognition service is currently unavailable."
         except Exception as e:
             print(f"Transcription error: {e}")
             return "I couldn't understand that."
+        if not result:
+            print(f"{self.stt.name} speech recognition could not understand audio")
+            return "I couldn't understand that."
+        print(f"{self.stt.name} speech recognition result: {result}")
+        return result
     
     def text_to_speech_and_play(self, text):
         """Convert text to speech and play it"""
         # You can use your existing TTS code here
-        pass
\ No newline at end of file
+        pass
+
+class UtteranceDetector:
+    """
+    Frame-by-frame speech segmentation, the state machine behind
+    listen_from_mic_with_vad. Works on a continuous stream of frames, so a
+    long-lived capture loop can keep feeding it across turns.
+
+    Every chunk goes into one preallocated int16 ring buffer, which doubles
+    as the pre-roll, so memory is bounded by the longest utterance. A
+    finished utterance is copied out of the ring once, when it is handed
+    off, so it stays intact however long transcription takes while capture
+    keeps overwriting the ring.
+    """
+
+    def __init__(self, is_speech, silence_chunks, pre_roll_chunks=10, max_chunks=1000,
+                 chunk_samples=480, noise_floor=None):
+        from src.audio_buffer import NoiseFloor, PcmRingBuffer, rms
+
+        self._rms = rms
+        self.is_speech = is_speech
+        self.silence_chunks = silence_chunks
+        self.max_chunks = max_chunks  # ~30 seconds of 30 ms chunks
+        # Audio context kept from before speech starts (~300ms)
+        self.pre_roll_samples = pre_roll_chunks * chunk_samples
+        self.chunk_samples = chunk_samples
+        # The longest utterance is max_chunks + 1 chunks, pre-roll included
+        self.ring = PcmRingBuffer((max_chunks + 1) * chunk_samples)
+        self.noise_floor = noise_floor or NoiseFloor()
+        self.level = 0.0
+        # Ring position just after the most recent speech chunk
+        self.voiced_until = 0
+        self.reset()
+
+    def reset(self):
+        """Drop any partial utterance"""
+        self.start = None
+        self.chunks = 0
+        self.in_speech = False
+        self.silent_chunks = 0
+
+    def push(self, data):
+        """Record one chunk without running VAD (keeps the pre-roll current)"""
+        self.level = self._rms(self.ring.write(data))
+        return self.level
+
+    def begin(self):
+        """Start an utterance from the pre-roll, when speech was detected elsewhere (barge-in)"""
+        self.reset()
+        self.in_speech = True
+        self.start = max(self.ring.oldest, self.ring.written - self.pre_roll_samples)
+        self.chunks = -(-(self.ring.written - self.start) // self.chunk_samples)
+
+    def feed(self, data):
+        """Add one chunk; returns the utterance as int16 PCM bytes once it has ended, else None"""
+        self.push(data)
+        speech = self.is_speech(data)
+        if speech:
+            self.voiced_until = self.ring.written
+        else:
+            self.noise_floor.update(self.level)
+
+        if not self.in_speech:
+            if speech:
+                # Speech just started: include the pre-roll to capture its beginning
+                self.begin()
+                print("Speech detected, recording...")
+            return None
+
+        self.chunks += 1
+        if speech:
+            self.silent_chunks = 0
+        else:
+            self.silent_chunks += 1
+            if self.silent_chunks >= self.silence_chunks:
+                print("Speech ended")
+                return self._finish()
+
+        if self.chunks > self.max_chunks:
+            print("Maximum recording time reached")
+            return self._finish()
+        return None
+
+    def current_audio(self):
+        """
+        The utterance recorded so far, as a zero-copy int16 array (None outside
+        speech). It is overwritten once capture moves on; copy it before
+        handing it to another thread.
+        """
+        if not self.in_speech:
+            return None
+        return self.ring.view(self.start)
+
+    def _finish(self):
+        audio = self.ring.view(self.start).tobytes()
+        self.reset()
+        return audio
+
+
+class EchoGate:
+    """
+    Decides whether speech heard while the agent is talking is the caller
+    barging in or the agent's own voice coming back through the microphone.
+
+    The loudest recent echo level is tracked (decaying over time) from chunks
+    captured during playback; a chunk only counts as caller speech if VAD
+    accepts it and it is `margin` times louder than that echo, for
+    `confirm_chunks` chunks in a row (by default the first such chunk
+    triggers, so barge-in lands within one 30 ms frame). The first
+    `warmup_chunks` of each playback only measure the echo; call reset()
+    when playback starts.
+    """
+
+    def __init__(self, is_speech, energy, floor=500, margin=2.0, confirm_chunks=1,
+                 warmup_chunks=10, decay=0.95, noise_floor=None):
+        self.is_speech = is_speech
+        self.energy = energy
+        self.floor = floor
+        self.noise_floor = noise_floor
+        self.margin = margin
+        self.confirm_chunks = confirm_chunks
+        self.warmup_chunks = warmup_chunks
+        self.decay = decay
+        self.echo_level = 0.0
+        self.seen = 0
+        self.hits = 0
+
+    def reset(self):
+        """Playback (re)started: measure the echo again before accepting speech"""
+        self.seen = 0
+        self.hits = 0
+
+    def feed(self, data, level=None):
+        """Add one chunk captured during playback; True once the caller is talking"""
+        if level is None:
+            level = self.energy(data)
+        self.seen += 1
+        if self.seen > self.warmup_chunks:
+            floor = self.floor
+            if self.noise_floor is not None and self.noise_floor.level is not None:
+                floor = max(floor, self.noise_floor.level * self.margin)
+            threshold = max(floor, self.echo_level * self.margin)
+            if level > threshold and self.is_speech(data):
+                self.hits += 1
+                if self.hits >= self.confirm_chunks:
+                    self.hits = 0
+                    return True
+                return False
+        self.hits = 0
+        # Anything that is not caller speech is treated as echo
+        self.echo_level = max(level, self.echo_level * self.decay)
+        return False
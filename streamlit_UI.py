@@ -5,16 +5,13 @@ import streamlit as st
 import threading
 import os
 import base64
+from functools import cached_property
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
-from elevenlabs import play
-from src.pdf_processor import DocumentProcessor
-from src.voice_interface import ImprovedVoiceInterface
-from src.gemini_handler import GeminiProcessor
-from src.chromadb_handler import ChromaDBHandler
-from src.rag_model import RAGModel
-import pyttsx3
-import time
+from src import resources
+
+# Subsystems (Gemini, Chroma/embeddings, voice I/O, TTS) are imported by the
+# VoiceAIAgent properties that first need them, so a text-only session never
+# loads the voice stack and the page renders before the models are ready.
 
 
 import pysqlite3
@@ -170,47 +167,110 @@ def create_button(label, key, is_end_call=False):
     """
     return button_html
 
+# Name used to personalize the opening pitch
+CLIENT_NAME = "Haris"
+
 class VoiceAIAgent:
     def __init__(self):
         load_dotenv()
-        self.doc_processor = DocumentProcessor()
         # self.gemini = GeminiProcessor(os.getenv("GEMINI_API_KEY"))
-        self.gemini = GeminiProcessor(st.session_state.get("gemini_api_key"))
-
-        self.db_handler = ChromaDBHandler()
-        self.rag = RAGModel(self.gemini, self.db_handler)
-        self.voice_interface = ImprovedVoiceInterface()
-
-        self.engine = pyttsx3.init()
-
-        print("Initializing voice AI agent...")
-        self.voice_interface.clear_audio_files()
-        print("Done")
-
+        self.api_key = st.session_state.get("gemini_api_key")
         self.conversation_history = []
         self.end_call = False
+        # Speak replies sentence by sentence as Gemini streams them
+        self.stream_responses = os.getenv("STREAM_RESPONSES", "1") == "1"
+        # Run calls on the asyncio stage pipeline in src/call_engine.py
+        self.pipelined_calls = os.getenv("PIPELINED_CALLS", "1") == "1"
+        # Let the caller interrupt the agent mid-reply (pipelined calls only)
+        self.barge_in = os.getenv("BARGE_IN", "1") == "1"
+        self._active_call = None
+
+    @cached_property
+    def doc_processor(self):
+        from src.pdf_processor import DocumentProcessor
+        return DocumentProcessor()
+
+    @cached_property
+    def gemini(self):
+        from src.gemini_handler import GeminiProcessor
+        from src.summary_cache import SummaryCache
+        return GeminiProcessor(self.api_key, cache=SummaryCache())
+
+    @cached_property
+    def summarizer(self):
+        from src.summarizer import ConcurrentSummarizer
+        return ConcurrentSummarizer(
+            self.gemini,
+            max_workers=int(os.getenv("SUMMARY_CONCURRENCY", 8)),
+            requests_per_minute=int(os.getenv("GEMINI_RPM", 60)),
+            max_chars_per_request=int(os.getenv("SUMMARY_BATCH_CHARS", 8000))
+        )
 
-    def process_documents(self, files):
+    @cached_property
+    def db_handler(self):
+        from src.chromadb_handler import ChromaDBHandler
+        return ChromaDBHandler()
+
+    @cached_property
+    def manifest(self):
+        from src.ingest_manifest import IngestManifest
+        return IngestManifest()
+
+    @cached_property
+    def rag(self):
+        from src.context_builder import ContextBuilder
+        from src.rag_model import RAGModel
+        # Context is capped at CONTEXT_TOKENS and passages past CONTEXT_MAX_DISTANCE are left out
+        builder = ContextBuilder(
+            max_tokens=int(os.getenv("CONTEXT_TOKENS", 600)),
+            max_distance=float(os.getenv("CONTEXT_MAX_DISTANCE", 1.4))
+        )
+        return RAGModel(self.gemini, self.db_handler, context_builder=builder)
+
+    @cached_property
+    def voice_interface(self):
+        from src.stt import make_stt
+        from src.voice_interface import ImprovedVoiceInterface
+        print("Initializing voice interface...")
+        # STT_BACKEND=whisper transcribes locally, with partial transcripts while the caller speaks
+        stt = None
+        if os.getenv("STT_BACKEND", "google") == "whisper":
+            stt = make_stt("whisper", model_size=os.getenv("WHISPER_MODEL", "base"))
+        voice_interface = ImprovedVoiceInterface(debug_audio_dir=os.getenv("VOICE_DEBUG_AUDIO_DIR"), stt=stt)
+        voice_interface.clear_audio_files()
+        print("Done")
+        return voice_interface
+
+    def process_documents(self, files, on_progress=None):
+        """
+        Index uploaded files as a diff against what is already stored.
+        Chunk IDs are content hashes, so unchanged chunks are skipped,
+        new or edited ones are upserted and chunks that disappeared are
+        deleted. Files go through IngestPipeline concurrently;
+        on_progress(doc_id, progress) is called as each file advances.
+        Returns {doc_id: progress} with the file's "name", "added",
+        "unchanged", "removed" counts and any "error".
+        """
         import tempfile
-        temp_paths = []
+        uploads = []
         for file in files:
             # Create a temporary file with the same extension as the uploaded file
             suffix = os.path.splitext(file.name)[1]
             with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
                 tmp.write(file.read())
-                temp_paths.append(tmp.name)
-        for path in temp_paths:
-            print(f"\nProcessing: {path}")
-            text = self.doc_processor.read_file(path)
-            chunks = self.doc_processor.chunk_text(text)
-            for i, chunk in enumerate(chunks):
-                processed = self.gemini.process_chunk(chunk)
-                if processed:
-                    self.db_handler.add_documents(
-                        documents=[processed['summary']],
-                        metadata=[{"source": path, "chunk": i}],
-                        ids=[f"{path}_chunk_{i}"]
-                    )
+                uploads.append((file.name, tmp.name))
+
+        from src.ingest_pipeline import IngestPipeline
+        pipeline = IngestPipeline(self.doc_processor, self.summarizer, self.db_handler, self.manifest)
+        try:
+            report = pipeline.run(uploads, on_progress=on_progress)
+        finally:
+            for _, path in uploads:
+                os.unlink(path)
+        print(f"Ingestion stage stats: {pipeline.stage_stats()}")
+        # The knowledge base changed, so get the next call's opening ready now
+        self.prepare_opening()
+        return report
 
     # def play_eleven_labs_audio(self, in_text):
     #     client = ElevenLabs(
@@ -226,41 +286,90 @@ class VoiceAIAgent:
     #     # return(audio)
     #     play(audio)
                     
-    def play_eleven_labs_audio(self, in_text):
-        client = ElevenLabs(
-            api_key=os.getenv("ELEVENLABS_API_KEY"),
-        )
-
+    @cached_property
+    def tts(self):
+        from src.tts import make_tts
+        from src.tts_cache import TTSCache
+        # Repeated phrases (goodbye, opening, clarifications) play from the on-disk cache
+        cache = None
+        if os.getenv("TTS_CACHE", "1") == "1":
+            cache = resources.shared("tts_cache", lambda: TTSCache(
+                max_bytes=int(os.getenv("TTS_CACHE_MB", 128)) * 1024 * 1024))
+        # TTS_RACE_DEADLINE=<seconds> speaks a sentence locally when the remote backend is slower than that
+        deadline = os.getenv("TTS_RACE_DEADLINE")
+        return make_tts(os.getenv("TTS_BACKEND", "elevenlabs"), cache=cache,
+                        race_deadline=float(deadline) if deadline else None)
+
+    def synthesize_speech(self, in_text):
+        """Return the audio for in_text as bytes from the configured TTS backend"""
+        return self.tts.synthesize(in_text)
+
+    def stream_speech(self, in_text):
+        """Return the audio for in_text as chunks, for the player to start on the first one"""
+        return self.tts.stream(in_text)
+
+    @cached_property
+    def player(self):
+        from src.playback import InterruptiblePlayer
+        # Plays any backend's MP3/WAV bytes or chunk stream through ffplay's stdin
+        return InterruptiblePlayer()
+
+    def play_speech(self, in_text, audio=None):
         try:
-            audio = client.text_to_speech.convert(
-                text=in_text,
-                voice_id="cgSgspJ2msm6clMCkdW9",
-                model_id="eleven_multilingual_v2",
-                output_format="mp3_44100_128",
-            )
-            play(audio)
+            if audio is None:
+                audio = self.stream_speech(in_text)
+            self.player.play(audio)
         except Exception as e:
             print(f"An error occurred: {e}")
 
+    @cached_property
+    def opening_cache(self):
+        from src.opening_cache import OpeningCache
+        return resources.shared("opening_cache", OpeningCache)
+
+    def _opening_key(self, client_name):
+        return (self.db_handler.version, client_name)
+
+    def _build_opening(self, client_name):
+        """Generate the opening pitch and its audio"""
+        opening = self.rag.generate_opening(client_name)
+        text = self._opening_text(opening)
+        audio = None
+        if text:
+            try:
+                audio = self.synthesize_speech(text)
+            except Exception as e:
+                print(f"Failed to synthesize opening audio: {e}")
+        return {"opening": opening, "text": text, "audio": audio}
+
+    def prepare_opening(self, client_name=CLIENT_NAME):
+        """Build the opening for the current knowledge base in the background"""
+        if not self.api_key:
+            return
+        self.opening_cache.prepare(self._opening_key(client_name), lambda: self._build_opening(client_name))
+
     def simulate_call(self, history=None):
         if history is None:
             history = []
+        self.end_call = False
 
-        # Generate and deliver opening
-        opening = self.rag.generate_opening("Haris")
-        if not opening:
+        # Use the opening prepared at ingestion time; only generate it now if there is none
+        opening = self.opening_cache.get(self._opening_key(CLIENT_NAME))
+        if opening is None:
+            opening = self._build_opening(CLIENT_NAME)
+        if not opening["text"]:
             print("Failed to generate opening pitch")
             return
-        
-        # st.toast("Call Starting. Please wait until the AI is listening")
-        with st.spinner("Starting call. Please wait until the AI is listening..."):
-            time.sleep(5)
 
         opening = self._deliver_opening(opening)
 
         history.append([None, opening])
         yield history
 
+        if self.pipelined_calls:
+            yield from self._pipelined_call(history)
+            return
+
         while not self.end_call:
             st.toast("Listening...")
 
@@ -275,7 +384,12 @@ class VoiceAIAgent:
 
             # st.toast("The AI is thinking...")
             with st.spinner("The AI is thinking..."):
-                response = self.rag.generate_response(user_input, [item[0] for item in history], True)
+                if self.stream_responses:
+                    # Sentences are spoken as they are generated, so there is nothing left to play afterwards
+                    response = self._deliver_response_stream(
+                        self.rag.generate_response_stream(user_input, [item[0] for item in history], True))
+                else:
+                    response = self.rag.generate_response(user_input, [item[0] for item in history], True)
 
             if response == "end call":
                 with st.spinner("Ending Call..."):
@@ -288,11 +402,56 @@ class VoiceAIAgent:
                 break
 
             response_text = response if isinstance(response, str) else response.get("response", "")
-            self._deliver_response(response_text)
+            if not self.stream_responses:
+                self._deliver_response(response_text)
             history[-1][1] = response_text  # Update the last history entry with AI response
             yield history
         self.end_call = False #reset end_call
 
+    def _pipelined_call(self, history):
+        """
+        Run the rest of the call on CallEngine in a background thread and
+        yield the updated history after each reply has been played.
+        """
+        import queue
+        from src.call_engine import CallEngine
+
+        call = object()
+        self._active_call = call
+        turns = queue.Queue()
+        interrupt = None
+        if self.barge_in:
+            # Duplex: the caller can talk over the agent and cut it off
+            interrupt = self.player.stop
+        engine = CallEngine(
+            self.voice_interface, self.rag, self.stream_speech, self.player.play,
+            interrupt=interrupt,
+            history=[item[0] for item in history],
+            on_turn=turns.put,
+            # A new call or the End Call button stops this one
+            should_stop=lambda: self.end_call or self._active_call is not call
+        )
+
+        def run():
+            try:
+                engine.run()
+            finally:
+                print(f"TTS: {self.tts.report()}")
+                turns.put(None)
+
+        threading.Thread(target=run, name="call-engine", daemon=True).start()
+        while True:
+            turn = turns.get()
+            if turn is None:
+                break
+            if turn.end_call:
+                history.append([turn.user_text, None])
+                history.append([None, turn.reply_text])
+            else:
+                history.append([turn.user_text, turn.reply_text])
+            yield history
+        self.end_call = False #reset end_call
+
     def manual_input(self, text_input, history):
         if not text_input:
             return history
@@ -315,39 +474,66 @@ class VoiceAIAgent:
         
         return history
 
-    def _deliver_opening(self, opening):
-        """Deliver structured opening pitch"""
+    def _opening_text(self, opening):
+        """Flatten a structured opening pitch into the text to speak"""
         # Handle list responses
         if isinstance(opening, list) and len(opening) > 0:
             opening = opening[0]
             
         if not isinstance(opening, dict):
             print(f"Error: Unexpected opening format - {type(opening)}")
-            return
+            return ""
 
-        print("\n=== AI Agent ===")
         full_text = ""
         for key in ['greeting', 'introduction', 'value_proposition', 'next_step_question']:
             text = opening.get(key, "")
             if text:
-                print(f"AI: {text}")
                 full_text += text + " "
+        return full_text
 
-        self.play_eleven_labs_audio(full_text)
+    def _deliver_opening(self, opening):
+        """Deliver a prepared opening, playing its pre-synthesized audio when available"""
+        full_text = opening["text"]
+        print("\n=== AI Agent ===")
+        print(f"AI: {full_text}")
+
+        self.play_speech(full_text, audio=opening["audio"])
         self.conversation_history.append(f"AI: {full_text}")
         return full_text
 
     def _deliver_response(self, response):
         print("\n=== AI Agent ===\nAI: ", response)
-        self.play_eleven_labs_audio(response)
+        self.play_speech(response)
+
+    def _deliver_response_stream(self, sentences):
+        """
+        Speak a streamed reply sentence by sentence while the rest is still
+        being generated. Returns the full reply text, or END_CALL.
+        """
+        from src.response_stream import END_CALL
+        from src.streaming_tts import StreamingSpeaker
+
+        speaker = StreamingSpeaker(self.stream_speech, self.player.play)
+        print("\n=== AI Agent ===")
+        try:
+            for sentence in sentences:
+                if sentence == END_CALL and not speaker.sentences:
+                    return END_CALL
+                print(f"AI: {sentence}")
+                speaker.speak(sentence)
+        except Exception as e:
+            print(f"Error while streaming response: {e}")
+        finally:
+            speaker.finish()
+        if speaker.first_audio_latency is not None:
+            print(f"First audio after {speaker.first_audio_latency:.2f}s")
+        return " ".join(speaker.sentences)
 
     def clear_database(self):
         try:
-            self.db_handler.client.delete_collection("company_data")
-            self.db_handler.collection = self.db_handler.client.get_or_create_collection(
-                name="company_data",
-                embedding_function=self.db_handler.embedding_fn
-            )
+            self.db_handler.clear()
+            self.manifest.clear()
+            self.prepare_opening()
             return True
         except Exception as e:
             print(f"Error clearing database: {e}")
@@ -355,7 +541,22 @@ class VoiceAIAgent:
 
 
 
-agent = VoiceAIAgent()
+# Heavy models and clients are process-wide (src/resources.py); start building them
+# as soon as the server imports this script instead of on the first click
+resources.warm_up()
+
+def get_agent():
+    """One agent per browser session, rebuilt only when the Gemini key changes"""
+    agent = st.session_state.get("agent")
+    if agent is None or agent.api_key != st.session_state.get("gemini_api_key"):
+        agent = VoiceAIAgent()
+        st.session_state["agent"] = agent
+        # Get the opening for the knowledge base already on disk ready before the first call;
+        # off the script thread, since it has to wait for Chroma to load
+        threading.Thread(target=agent.prepare_opening, name="warm-opening", daemon=True).start()
+    return agent
+
+agent = get_agent()
 
 def process_and_start(files, history):
     file_paths = [file.name for file in files]
@@ -449,9 +650,29 @@ def main():
         
         if st.button("Add Documents to Personal AI") and uploaded_files:
             # st.toast("Adding documents. Please wait")
+            # One bar per document ID, so uploads sharing a file name each get their own
+            progress_bars = {}
+
+            def show_progress(doc_id, progress):
+                total = progress["chunks_total"]
+                fraction = progress["chunks_done"] / total if total else 0.0
+                if progress["stage"] in ("done", "failed"):
+                    fraction = 1.0
+                if doc_id not in progress_bars:
+                    progress_bars[doc_id] = st.progress(0.0)
+                progress_bars[doc_id].progress(fraction, text=f"{progress['name']}: {progress['stage']}")
+
             with st.spinner("Adding documents. Please wait..."):
-                agent.process_documents(uploaded_files)  # Pass the actual file objects
-            st.success(f"Added {len(uploaded_files)} documents to the database!")
+                report = agent.process_documents(uploaded_files, on_progress=show_progress)  # Pass the actual file objects
+            added = [counts["name"] for counts in report.values() if not counts["error"]]
+            st.success(f"Added {len(added)} documents to the database!")
+            for counts in report.values():
+                name = counts["name"]
+                if counts["error"]:
+                    st.error(f"{name}: {counts['error']}")
+                else:
+                    st.caption(f"{name}: {counts['added']} new, {counts['unchanged']} unchanged, "
+                               f"{counts['removed']} removed chunks")
             # st.session_state["uploaded_files"] = []  # Clear the file uploader list
         
         if st.button("Clear Knowledge Base"):
@@ -0,0 +1,40 @@
+# test_blob_cache.py
+from src.blob_cache import BlobCache
+
+
+def stored_bytes(cache):
+    return cache._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {cache.table}").fetchone()[0]
+
+
+def test_running_total_tracks_replacements_and_evictions(tmp_path):
+    cache = BlobCache(str(tmp_path / "blobs.db"), max_bytes=100)
+    cache.put("a", b"x" * 40)
+    cache.put("b", b"x" * 40)
+    cache.put("a", b"x" * 10)  # replaced, not added
+    assert cache._total == stored_bytes(cache) == 50
+
+    cache.put("c", b"x" * 60)  # over the limit: the least recently used entry goes
+    assert cache.get("b") is None
+    assert cache._total == stored_bytes(cache) == 70
+
+    # A reopened cache picks the total up from disk
+    assert BlobCache(str(tmp_path / "blobs.db"), max_bytes=100)._total == 70
+    cache.clear()
+    assert cache._total == stored_bytes(cache) == 0
+
+
+def test_hits_are_written_in_batches_but_still_steer_eviction(tmp_path):
+    cache = BlobCache(str(tmp_path / "blobs.db"), max_bytes=100, touch_batch=8)
+    cache.put("old", b"x" * 40)
+    cache.put("new", b"x" * 40)
+
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for _ in range(3):
+        assert cache.get("old") == b"x" * 40
+    assert not [s for s in statements if s.startswith(("UPDATE", "COMMIT"))]
+
+    # The pending hit on "old" is written before eviction picks a victim
+    cache.put("third", b"x" * 40)
+    assert cache.get("old") is not None
+    assert cache.get("new") is None
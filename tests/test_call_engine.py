@@ -0,0 +1,152 @@
+# test_call_engine.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.call_engine import CallEngine, Speculation, Turn
+from src.response_stream import END_CALL
+from src.voice_interface import UtteranceDetector
+
+SPEECH = [0] * 10 + [1] * 20 + [0] * 40
+
+
+class FakeStream:
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeVoice:
+    """Two utterances of scripted 2-sample chunks; transcribe() fails on the first"""
+
+    RATE = 40
+
+    def __init__(self):
+        self.script = SPEECH * 2
+        self.read = 0
+        self.transcribed = 0
+
+    def open_input_stream(self):
+        return FakeStream()
+
+    def read_frame(self, stream):
+        time.sleep(0.002)
+        value = self.script[self.read] if self.read < len(self.script) else 0
+        self.read += 1
+        return np.array([value, value], np.int16).tobytes()
+
+    def utterance_detector(self):
+        return UtteranceDetector(lambda data: data[0] == 1, silence_chunks=20, chunk_samples=2)
+
+    def transcribe(self, audio):
+        self.transcribed += 1
+        if self.transcribed == 1:
+            raise RuntimeError("speech service unavailable")
+        return "goodbye"
+
+
+class FakeRag:
+    def fetch_context(self, query):
+        return ""
+
+    def generate_response_stream(self, text, history, audio_check, context=None, prompt=None):
+        yield END_CALL
+
+
+def test_failed_transcription_keeps_listening():
+    voice = FakeVoice()
+    turns = []
+    engine = CallEngine(voice, FakeRag(), lambda text: text.encode(), lambda audio: None,
+                        on_turn=turns.append, should_stop=lambda: voice.read > 10 * len(voice.script))
+    thread = threading.Thread(target=engine.run, daemon=True)
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    # The second utterance was heard and answered even though the first one's STT raised
+    assert voice.transcribed == 2
+    assert [turn.user_text for turn in turns] == ["goodbye"]
+    assert turns[0].end_call
+
+
+def test_streamed_audio_reaches_the_player_in_chunks():
+    voice = FakeVoice()
+    played = []
+
+    def synthesize(text):
+        data = text.encode()
+        for start in range(0, len(data), 4):
+            yield data[start:start + 4]
+
+    engine = CallEngine(voice, FakeRag(), synthesize, lambda audio: played.append(list(audio)),
+                        should_stop=lambda: voice.read > 10 * len(voice.script))
+    thread = threading.Thread(target=engine.run, daemon=True)
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert len(played) == 1 and len(played[0]) > 1
+    assert all(len(chunk) <= 4 for chunk in played[0])
+    assert b"".join(played[0]).decode().strip()
+
+
+class SpeculatingRag:
+    """Returns the same candidates for any query"""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.contexts = 0
+
+    def retrieve(self, query):
+        time.sleep(0.05)
+        return {"ids": list(self.ids), "documents": ["doc"] * len(self.ids), "distances": [0.1] * len(self.ids)}
+
+    def context_from(self, hits):
+        self.contexts += 1
+        return " ".join(hits["ids"])
+
+    def response_prompt(self, user_input, history, audio_check, context=None):
+        return f"{context} | {user_input}"
+
+
+def retrieve_turn(rag, final_ids, spoken, final):
+    """Run the retrieval stage for a turn speculated on `spoken` whose final transcript is `final`"""
+    engine = CallEngine(FakeVoice(), rag, None, None)
+    engine.speculate = True
+
+    async def run():
+        engine._loop = asyncio.get_running_loop()
+        engine._executor = ThreadPoolExecutor(max_workers=2)
+        engine._transcripts = asyncio.Queue()
+        engine._prompts = asyncio.Queue()
+        turn = Turn(1)
+        turn.speculation = Speculation(spoken, [])
+        turn.speculation_task = asyncio.ensure_future(engine._prepare(turn.speculation))
+        await turn.speculation_task
+        rag.ids = final_ids
+        turn.user_text = final
+        engine._transcripts.put_nowait(turn)
+        await engine._retrieve()
+        return engine._prompts.get_nowait()
+
+    return engine, asyncio.run(run())
+
+
+def test_same_candidates_reuse_the_speculative_context():
+    rag = SpeculatingRag(["a", "b"])
+    engine, turn = retrieve_turn(rag, ["a", "b"], "what does it cost", "what does it cost per month")
+    assert turn.context == "a b"
+    assert turn.prompt == "a b | what does it cost per month"
+    assert rag.contexts == 1  # only the speculative one
+    assert engine.speculation_stats["set_hits"] == 1
+
+    rag = SpeculatingRag(["a", "b"])
+    engine, turn = retrieve_turn(rag, ["c"], "what does it cost", "who are your clients")
+    assert turn.context == "c"
+    assert turn.prompt is None
+    assert engine.speculation_stats["misses"] == 1
@@ -0,0 +1,118 @@
+# test_chunking.py
+import random
+import re
+
+import pytest
+
+from src import pdf_processor
+from src.ingest_manifest import IngestManifest, chunk_id
+
+WORDS = ("our company provides marketing analytics SEO social media strategy "
+         "for clients in retail finance and healthcare with steady growth").split()
+
+
+@pytest.fixture(autouse=True)
+def simple_sentences(monkeypatch):
+    # Punkt data may not be installed; the chunker only needs some sentence split
+    monkeypatch.setattr(pdf_processor, "sent_tokenize",
+                        lambda text: [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s])
+
+
+def make_sentences(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30))).capitalize() + "."
+            for _ in range(count)]
+
+
+def test_local_edit_only_changes_nearby_chunks(tmp_path):
+    processor = pdf_processor.DocumentProcessor()
+    sentences = make_sentences(1500)
+    original = processor.chunk_text(" ".join(sentences), content_defined=True)
+    assert len(original) > 100
+
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.update("doc", "doc.txt", [chunk_id("doc", chunk) for chunk in original])
+
+    # One-line edit near the start of the document
+    edited = list(sentences)
+    edited[20] = "This line was rewritten by an editor."
+    chunks = processor.chunk_text(" ".join(edited), content_defined=True)
+    added, unchanged, removed = manifest.diff("doc", [chunk_id("doc", chunk) for chunk in chunks])
+
+    assert len(added) <= 4
+    assert len(removed) <= 4
+    assert len(unchanged) >= len(original) - 4
+    # Everything that changed sits next to the edit
+    edit_chunk = next(i for i, chunk in enumerate(chunks) if "rewritten by an editor" in chunk)
+    changed = [i for i, chunk in enumerate(chunks) if chunk_id("doc", chunk) in added]
+    assert all(abs(i - edit_chunk) <= 2 for i in changed)
+
+
+@pytest.mark.parametrize("content_defined", [False, True])
+def test_iter_chunks_matches_chunk_text(content_defined):
+    processor = pdf_processor.DocumentProcessor()
+    text = " ".join(make_sentences(800, seed=3))
+    pages = [text[i:i + 2500] for i in range(0, len(text), 2500)]
+    assert (list(processor.iter_chunks(pages, block_size=4096, content_defined=content_defined))
+            == processor.chunk_text(text, content_defined=content_defined))
+
+
+def baseline_chunk_text(text, chunk_size=1000, overlap=200):
+    """Frozen copy of the original chunk_text, which the default chunker must match byte for byte"""
+    sentences = pdf_processor.sent_tokenize(text)
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for sentence in sentences:
+        if current_length + len(sentence) > chunk_size and current_chunk:
+            chunks.append(" ".join(current_chunk))
+            total = count = 0
+            for kept in reversed(current_chunk):
+                total += len(kept)
+                count += 1
+                if total >= overlap:
+                    break
+            current_chunk = current_chunk[-count:]
+            current_length = sum(len(kept) for kept in current_chunk)
+        current_chunk.append(sentence)
+        current_length += len(sentence)
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def make_run_on_text(words=60000):
+    rng = random.Random(7)
+    run_on = " ".join(rng.choice(WORDS) for _ in range(words))
+    return " ".join(make_sentences(50, seed=8)) + " " + run_on + ". " + " ".join(make_sentences(50, seed=9))
+
+
+@pytest.mark.parametrize("text", [" ".join(make_sentences(800, seed=4)), make_run_on_text()],
+                         ids=["prose", "run-on"])
+def test_default_chunking_matches_baseline(text):
+    processor = pdf_processor.DocumentProcessor()
+    pages = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+    expected = baseline_chunk_text(text)
+    assert processor.chunk_text(text) == expected
+    assert list(processor.iter_chunks(pages, block_size=4096)) == expected
+
+
+def test_iter_chunks_tokenizes_run_on_text_in_linear_time(monkeypatch):
+    tokenized = []
+    sent_tokenize = pdf_processor.sent_tokenize
+    monkeypatch.setattr(pdf_processor, "sent_tokenize", lambda text: tokenized.append(len(text)) or sent_tokenize(text))
+    processor = pdf_processor.DocumentProcessor()
+    text = make_run_on_text(words=200000)
+    pages = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+    list(processor.iter_chunks(pages, block_size=4096))
+    # Re-tokenizing the whole held-back sentence for every block would be ~150x the text
+    assert sum(tokenized) < 6 * len(text)
+
+
+def test_content_defined_chunks_stay_bounded_on_run_on_text():
+    processor = pdf_processor.DocumentProcessor()
+    text = make_run_on_text()
+    pages = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+    chunks = list(processor.iter_chunks(pages, block_size=4096, content_defined=True))
+    assert chunks == processor.chunk_text(text, content_defined=True)
+    assert max(len(chunk) for chunk in chunks) <= 1100
@@ -0,0 +1,63 @@
+# test_context_builder.py
+from src.context_builder import ContextBuilder, estimate_tokens
+
+
+def hits(*passages):
+    """Chroma-style results from (id, document, distance) tuples"""
+    return {"ids": [p[0] for p in passages], "documents": [p[1] for p in passages],
+            "distances": [p[2] for p in passages]}
+
+
+def test_passages_are_packed_into_the_token_budget():
+    sentence = "Our support team answers every ticket within one business day."
+    document = " ".join([sentence.replace("one", str(i)) for i in range(10)])
+    builder = ContextBuilder(max_tokens=60, margin=None)
+    selected, stats = builder.select(hits(("a", document, 0.2),
+                                          ("b", "We also offer on-site visits to clients across the region.", 0.3)))
+
+    assert stats["tokens"] <= 60
+    assert [id for id, _, _ in selected] == ["a"]
+    assert sum(estimate_tokens(s) + 1 for s in selected[0][1].split(". ")) <= 60
+    # Whole sentences only, cut where the budget ran out
+    assert selected[0][1].endswith(".") and selected[0][1] in document
+    assert stats["dropped"]["budget"] == 1
+
+
+def test_overlapping_sentences_and_near_duplicates_are_dropped():
+    shared = "Plans start at a flat monthly fee. Every plan includes round-the-clock monitoring."
+    builder = ContextBuilder(margin=None)
+    selected, stats = builder.select(hits(
+        ("first", shared + " Setup takes one week.", 0.2),
+        # Neighbouring chunk: its overlap with the first one is removed, the new sentence kept
+        ("second", "Every plan includes round-the-clock monitoring. Discounts apply to yearly contracts.", 0.3),
+        # Nothing new at all
+        ("copy", shared, 0.4),
+    ))
+
+    assert [id for id, _, _ in selected] == ["first", "second"]
+    assert selected[1][1] == "Discounts apply to yearly contracts."
+    assert stats["dropped"]["duplicate"] == 1
+
+
+def test_distance_cutoff_keeps_at_least_min_results():
+    builder = ContextBuilder(max_distance=1.0, margin=0.3)
+    selected, stats = builder.select(hits(
+        ("close", "We build websites.", 0.5),
+        ("near", "We run ad campaigns.", 0.7),
+        ("behind", "We sell hosting.", 0.9),  # within max_distance but more than margin behind the best
+        ("far", "We write newsletters.", 1.2),
+    ))
+    assert [id for id, _, _ in selected] == ["close", "near"]
+    assert stats["dropped"]["distance"] == 2
+
+    # Everything past the cutoff: the best hit is still used
+    selected, _ = builder.select(hits(("far", "We write newsletters.", 1.5), ("farther", "We sell hosting.", 1.8)))
+    assert [id for id, _, _ in selected] == ["far"]
+
+
+def test_select_keeps_no_state_between_calls():
+    builder = ContextBuilder()
+    _, first = builder.select(hits(("a", "We build websites.", 0.2)))
+    _, second = builder.select(hits(("b", "We run ad campaigns.", 0.2), ("c", "We sell hosting.", 2.0)))
+    assert first["candidates"] == 1 and second["candidates"] == 2
+    assert not hasattr(builder, "last")
@@ -0,0 +1,44 @@
+# test_embedding_cache.py
+import time
+
+import numpy as np
+
+from src.embedding_cache import EmbeddingCache
+
+
+def vectors(*values):
+    return np.array([[value, value] for value in values], dtype=np.float32)
+
+
+def slots(cache):
+    return dict(cache._conn.execute("SELECT key, slot FROM entries").fetchall())
+
+
+def test_rows_fill_up_then_least_recently_used_are_reused(tmp_path):
+    cache = EmbeddingCache("model", dim=2, directory=str(tmp_path), capacity=4)
+    cache.put_many(["a", "b", "c"], vectors(1, 2, 3))
+    assert sorted(slots(cache).values()) == [0, 1, 2]
+
+    time.sleep(0.01)
+    cache.get_many(["a"])
+    cache.put_many(["d", "e"], vectors(4, 5))  # one free row, then "b" is the oldest
+    assert sorted(slots(cache)) == ["a", "c", "d", "e"]
+    assert sorted(slots(cache).values()) == [0, 1, 2, 3]
+    found = cache.get_many(["a", "b", "e"])
+    assert sorted(found) == ["a", "e"]
+    assert found["a"][0] == 1 and found["e"][0] == 5
+
+
+def test_reopened_cache_continues_after_the_used_rows(tmp_path):
+    cache = EmbeddingCache("model", dim=2, directory=str(tmp_path), capacity=8)
+    cache.put_many(["a", "b", "c", "d"], vectors(1, 2, 3, 4))
+    hole = slots(cache)["b"]
+    cache._conn.execute("DELETE FROM entries WHERE key = 'b'")
+    cache._conn.commit()
+
+    reopened = EmbeddingCache("model", dim=2, directory=str(tmp_path), capacity=8)
+    reopened.put_many(["x", "y"], vectors(7, 8))
+    # The hole left by "b" first, then the next unused row
+    assert slots(reopened)["x"] == hole
+    assert slots(reopened)["y"] == 4
+    assert reopened.get_many(["a", "x"])["x"][0] == 7
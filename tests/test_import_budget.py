@@ -0,0 +1,69 @@
+# test_import_budget.py
+"""
+Import-time budget for the UI entry point and every src module.
+
+Each module is imported in a fresh interpreter with `python -X importtime`
+and its cumulative import time is compared with its budget. Modules are
+discovered from src/*.py, so a new module is covered by DEFAULT_BUDGET
+until it is given an override. Modules whose third-party dependencies are
+not installed are skipped. Set IMPORT_BUDGET_SCALE on slower machines.
+"""
+import glob
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCALE = float(os.getenv("IMPORT_BUDGET_SCALE", 1.0))
+
+# Seconds. Everything must defer third-party imports until first use
+DEFAULT_BUDGET = 0.1
+BUDGETS = {
+    "streamlit_UI": 2.0,
+    # NumPy
+    "src.audio_buffer": 0.3,
+    "src.embedding_cache": 0.3,
+    "src.stt": 0.3,
+    # asyncio
+    "src.call_engine": 0.2,
+    # Modules whose whole purpose is a heavy dependency
+    "src.chromadb_handler": 3.0,
+    "src.embedder": 10.0,
+}
+
+MODULES = ["streamlit_UI"] + sorted(
+    "src." + os.path.splitext(os.path.basename(path))[0]
+    for path in glob.glob(os.path.join(ROOT, "src", "*.py"))
+    if not path.endswith("__init__.py")
+)
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+_MISSING = re.compile(r"ModuleNotFoundError: No module named '([^']+)'")
+
+
+def import_time(module):
+    """Cumulative import time of `module` in seconds, from -X importtime output"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        missing = _MISSING.search(result.stderr)
+        if missing and not missing.group(1).startswith("src"):
+            pytest.skip(f"{missing.group(1)} is not installed")
+        raise AssertionError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match and match.group(4) == module:
+            return int(match.group(2)) / 1e6
+    raise AssertionError("module not found in -X importtime output")
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_time_within_budget(module):
+    budget = BUDGETS.get(module, DEFAULT_BUDGET) * SCALE
+    seconds = import_time(module)
+    assert seconds <= budget, f"{module} took {seconds * 1000:.1f} ms to import (budget {budget * 1000:.0f} ms)"
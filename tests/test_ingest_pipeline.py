@@ -0,0 +1,128 @@
+# test_ingest_pipeline.py
+import re
+import threading
+
+import numpy as np
+import pytest
+
+from src import pdf_processor
+from src.ingest_manifest import IngestManifest
+from src.ingest_pipeline import IngestPipeline
+
+
+@pytest.fixture(autouse=True)
+def simple_sentences(monkeypatch):
+    monkeypatch.setattr(pdf_processor, "sent_tokenize",
+                        lambda text: [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s])
+
+
+class FakeCollection:
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, documents, metadatas, ids, embeddings=None):
+        self.rows.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for id in ids:
+            self.rows.pop(id, None)
+
+
+class FakeWriter:
+    """BulkWriter's interface, writing straight into a FakeCollection"""
+
+    def __init__(self, collection, on_written):
+        self.collection = collection
+        self.on_written = on_written
+        self.pending = {}
+
+    def add(self, document, metadata, id, embedding=None):
+        self.pending[id] = document
+
+    def flush(self):
+        self.collection.upsert(list(self.pending.values()), None, list(self.pending))
+        self.on_written(list(self.pending))
+        self.pending = {}
+
+    def discard(self):
+        self.pending = {}
+
+
+class FakeEmbedder:
+    def embed_batch(self, texts):
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+class FakeDB:
+    class embedding_fn:
+        embedder = FakeEmbedder()
+
+    def __init__(self, broken_writer=False):
+        self.collection = FakeCollection()
+        self.broken_writer = broken_writer
+
+    def bulk_writer(self, on_written=None):
+        if self.broken_writer:
+            raise RuntimeError("database is locked")
+        return FakeWriter(self.collection, on_written)
+
+    def delete_documents(self, ids):
+        self.collection.delete(ids)
+
+
+class FakeSummarizer:
+    max_workers = 2
+    max_chars_per_request = 4000
+
+    def summarize_batch(self, chunks):
+        return [{"summary": "S: " + chunk[:30]} for chunk in chunks]
+
+
+class FlakyManifest(IngestManifest):
+    """Raises while recording one document, like a manifest that can't be written"""
+
+    def update(self, doc_id, name, ids):
+        if name == "broken.txt":
+            raise OSError("disk full")
+        super().update(doc_id, name, ids)
+
+
+def write_files(tmp_path, names):
+    uploads = []
+    for name in names:
+        path = tmp_path / name
+        path.write_text(" ".join(f"{name} sentence number {i} is here." for i in range(200)))
+        uploads.append((name, str(path)))
+    return uploads
+
+
+def run_with_timeout(pipeline, uploads, seconds=30):
+    report = {}
+    thread = threading.Thread(target=lambda: report.update(pipeline.run(uploads)), daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "ingestion hung"
+    return {progress["name"]: progress for progress in report.values()}
+
+
+def test_manifest_failure_only_fails_its_file(tmp_path):
+    db = FakeDB()
+    manifest = FlakyManifest(str(tmp_path / "manifest.json"))
+    pipeline = IngestPipeline(pdf_processor.DocumentProcessor(), FakeSummarizer(), db, manifest)
+    report = run_with_timeout(pipeline, write_files(tmp_path, ["a.txt", "broken.txt", "b.txt"]))
+
+    assert "disk full" in report["broken.txt"]["error"]
+    for name in ("a.txt", "b.txt"):
+        assert report[name]["stage"] == "done"
+        assert report[name]["error"] is None
+        assert report[name]["added"] > 0
+
+
+def test_crashed_stage_does_not_hang_run(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    pipeline = IngestPipeline(pdf_processor.DocumentProcessor(), FakeSummarizer(), FakeDB(broken_writer=True),
+                              manifest, queue_size=4)
+    report = run_with_timeout(pipeline, write_files(tmp_path, ["a.txt", "b.txt"]))
+
+    assert all(progress["stage"] == "failed" for progress in report.values())
+    assert all("database is locked" in progress["error"] for progress in report.values())
@@ -0,0 +1,114 @@
+# test_summarizer.py
+import json
+import re
+from types import SimpleNamespace
+
+from src.gemini_handler import GeminiProcessor
+from src.summarizer import ConcurrentSummarizer, TokenBucket
+
+
+class ResourceExhausted(Exception):
+    """Named like google.api_core's 429 error"""
+
+
+class FakeModel:
+    """
+    Answers summary prompts like Gemini: one object for a single chunk, an
+    array for a [Chunk N] batch. `failures` are raised first, in order, and
+    batch entries for `drop` indices (numbered within the request) are left out.
+    """
+
+    def __init__(self, failures=(), drop=()):
+        self.failures = list(failures)
+        self.drop = set(drop)
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        if self.failures:
+            raise self.failures.pop(0)
+        indices = [int(i) for i in re.findall(r"\[Chunk (\d+)\]", prompt)]
+        if not indices:
+            text = prompt.split("Text:")[1].split("Respond with")[0].strip()
+            return SimpleNamespace(text=json.dumps({"key_points": [], "summary": "S:" + text, "keywords": []}))
+        sections = re.split(r"\[Chunk \d+\]\n", prompt.split("Chunks:")[1].split("Respond with")[0])[1:]
+        entries = [{"index": i, "key_points": [], "summary": "S:" + section.strip(), "keywords": []}
+                   for i, section in zip(indices, sections) if i not in self.drop]
+        return SimpleNamespace(text=json.dumps(entries))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_summarizer(model, clock, **kwargs):
+    summarizer = ConcurrentSummarizer(GeminiProcessor(None, model=model), sleep=clock.sleep, **kwargs)
+    summarizer.bucket = TokenBucket(kwargs.get("requests_per_minute", 6000), clock=clock, sleep=clock.sleep)
+    return summarizer
+
+
+def test_token_bucket_waits_once_the_burst_is_spent():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=2, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    # Two tokens of burst, then one per second
+    assert clock.sleeps == [1.0]
+    clock.now += 5
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [1.0]
+
+
+def test_quota_errors_are_retried_with_bounded_backoff():
+    clock = FakeClock()
+    model = FakeModel(failures=[ResourceExhausted("exhausted"), RuntimeError("429 Too Many Requests")])
+    summarizer = make_summarizer(model, clock, base_delay=1.0, max_delay=30.0)
+
+    assert summarizer.summarize_chunk("pricing")["summary"] == "S:pricing"
+    assert len(model.prompts) == 3
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 1.0 and 0 <= clock.sleeps[1] <= 2.0
+
+
+def test_other_errors_and_exhausted_retries_give_up():
+    clock = FakeClock()
+    model = FakeModel(failures=[ValueError("bad request")])
+    assert make_summarizer(model, clock).summarize_chunk("pricing") is None
+    assert len(model.prompts) == 1 and clock.sleeps == []
+
+    model = FakeModel(failures=[ResourceExhausted("exhausted")] * 3)
+    assert make_summarizer(model, clock, max_retries=2).summarize_chunk("pricing") is None
+    assert len(model.prompts) == 3
+
+
+def test_chunks_are_batched_and_dropped_entries_retried_alone():
+    clock = FakeClock()
+    chunks = [f"chunk {i} " + "x" * 40 for i in range(6)]
+    model = FakeModel(drop={1})
+    summarizer = make_summarizer(model, clock, max_chars_per_request=150)
+
+    results = summarizer.summarize_batch(chunks)
+    assert [result["summary"] for result in results] == ["S:" + chunk for chunk in chunks]
+    # Three chunks per request, plus the second of each (index 1 within its request) on its own
+    batches = [prompt for prompt in model.prompts if "[Chunk " in prompt]
+    assert len(batches) == 2
+    assert len(model.prompts) == 4
+
+
+def test_summarize_reports_every_chunk_in_order():
+    clock = FakeClock()
+    chunks = [f"chunk {i}" for i in range(10)]
+    seen = {}
+    results = make_summarizer(FakeModel(), clock, max_workers=4).summarize(chunks, on_result=seen.__setitem__)
+    assert [result["summary"] for result in results] == ["S:" + chunk for chunk in chunks]
+    assert sorted(seen) == list(range(10))
@@ -0,0 +1,115 @@
+# test_tts.py
+import struct
+import time
+
+import pytest
+
+from src.playback import InterruptiblePlayer
+from src.tts import RacingTTS, TTSBackend, playing_seconds, start_audio
+
+
+def mp3_frames(count, version, bitrate_index, rate_index, frame_length, padding_every=0):
+    """MPEG layer III frames with silent payloads: `version` is 3 for MPEG-1, 2 for MPEG-2"""
+    frames = []
+    for i in range(count):
+        padding = 1 if padding_every and i % padding_every == 0 else 0
+        header = bytes([0xFF, 0xE0 | version << 3 | 1 << 1 | 1, bitrate_index << 4 | rate_index << 2 | padding << 1, 0xC4])
+        frames.append(header + bytes(frame_length + padding - 4))
+    return b"".join(frames)
+
+
+def test_mp3_length_comes_from_frame_headers():
+    # ElevenLabs' mp3_44100_128: MPEG-1, 1152 samples per frame, 417/418-byte frames
+    elevenlabs = mp3_frames(100, version=3, bitrate_index=9, rate_index=0, frame_length=417, padding_every=3)
+    assert abs(playing_seconds(elevenlabs) - 100 * 1152 / 44100) < 1e-6
+
+    # gTTS: 32 kbps MPEG-2 at 24 kHz, which a 128 kbps byte-count estimate puts at a quarter of its length
+    gtts = mp3_frames(100, version=2, bitrate_index=4, rate_index=1, frame_length=96)
+    assert abs(playing_seconds(gtts) - 100 * 576 / 24000) < 1e-6
+    assert len(gtts) * 8 / 128000 < playing_seconds(gtts) / 3
+
+
+def test_id3_tag_and_junk_are_skipped():
+    tag = b"ID3\x04\x00\x00" + bytes([0, 0, 1, 0]) + bytes(128)  # 128-byte (syncsafe) tag body
+    frames = mp3_frames(10, version=2, bitrate_index=4, rate_index=1, frame_length=96)
+    assert abs(playing_seconds(tag + b"\x00junk" + frames) - 10 * 576 / 24000) < 1e-6
+
+
+def test_wav_length_and_unknown_audio():
+    pcm = bytes(32000)  # one second of 16 kHz 16-bit mono
+    header = b"RIFF" + struct.pack("<I", 36 + len(pcm)) + b"WAVEfmt " + struct.pack(
+        "<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16) + b"data" + struct.pack("<I", len(pcm))
+    assert playing_seconds(header + pcm) == 1.0
+    assert playing_seconds(b"not audio at all") is None
+
+
+class FakeBackend(TTSBackend):
+    name = "fake"
+
+    def __init__(self, chunks, delays=()):
+        super().__init__()
+        self.chunks = chunks
+        self.delays = list(delays)
+
+    def cache_key(self, text):
+        return text
+
+    def _chunks(self, text):
+        for i, chunk in enumerate(self.chunks):
+            time.sleep(self.delays[i] if i < len(self.delays) else 0)
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+def test_backends_must_implement_chunks_and_cache_key():
+    class Incomplete(TTSBackend):
+        def _chunks(self, text):
+            yield b""
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_racing_stream_passes_chunks_through_or_falls_back():
+    fast = RacingTTS(FakeBackend([b"a", b"b"]), FakeBackend([b"local"]), deadline=0.5)
+    assert list(fast.stream("hi")) == [b"a", b"b"]
+    assert fast.primary_wins == 1
+
+    slow = RacingTTS(FakeBackend([b"a"], delays=[0.5]), FakeBackend([b"local"]), deadline=0.05)
+    assert list(slow.stream("hi")) == [b"local"]
+    assert slow.fallbacks == 1
+
+    # Once the first chunk is out a stall can only cut the clip short
+    stalled = RacingTTS(FakeBackend([b"a", b"b"], delays=[0, 0.5]), FakeBackend([b"local"]),
+                        deadline=0.05, total_deadline=0.1)
+    assert list(stalled.stream("hi")) == [b"a"]
+
+
+def test_prefetched_audio_reports_errors_before_the_first_chunk():
+    with pytest.raises(RuntimeError):
+        start_audio(FakeBackend([RuntimeError("quota")]).stream("hi"))
+
+    audio = start_audio(FakeBackend([b"a", b"b"], delays=[0, 0.05]).stream("hi"))
+    assert list(audio) == [b"a", b"b"]
+    assert audio.done.is_set() and audio.audio == b"ab"
+    assert start_audio(b"whole") == b"whole"
+
+
+def test_player_writes_chunks_as_they_arrive(tmp_path):
+    out = tmp_path / "played"
+    player = InterruptiblePlayer(command=("sh", "-c", f"cat > {out}"))
+    seen_first = []
+
+    def chunks():
+        yield b"first"
+        # The player must have handed the first chunk over before asking for the next one
+        deadline = time.time() + 5
+        while time.time() < deadline and not (out.exists() and out.read_bytes()):
+            time.sleep(0.01)
+        seen_first.append(out.read_bytes())
+        yield b"second"
+
+    assert player.play(chunks())
+    assert seen_first == [b"first"]
+    assert out.read_bytes() == b"firstsecond"